@@ -1,20 +1,399 @@
 import os
+import codecs
+import contextlib
+import hashlib
+import heapq
+import json
+import random
+import re
+import sys
+import time
+import argparse
 import aiohttp
 import asyncio
 
-async def download_hosts_file(session, url):
+# Addresses upstream lists use to block a name; any other address is a redirect, not a block
+BLOCK_ADDRESSES = {'0.0.0.0', '127.0.0.1', '0', '::', '::1', '0:0:0:0:0:0:0:0', '0:0:0:0:0:0:0:1'}
+# Names every hosts file defines for the machine itself
+LOCAL_NAMES = {'localhost', 'localhost.localdomain', 'local', 'broadcasthost', 'ip6-localhost', 'ip6-loopback',
+               'ip6-localnet', 'ip6-mcastprefix', 'ip6-allnodes', 'ip6-allrouters', 'ip6-allhosts', '0.0.0.0'}
+_HOSTNAME_RE = re.compile(r'^(?=.{1,253}$)(?!-)[a-z0-9_-]{1,63}(?<!-)(?:\.(?!-)[a-z0-9_-]{1,63}(?<!-))*$')
+_ADDRESS_RE = re.compile(r'^(?:\d{1,3}(?:\.\d{1,3}){3}|[0-9a-f]*:[0-9a-f:.]*|0)$')
+
+def normalize_hostname(name):
     """
-    Asynchronously download the hosts file from the given URL.
+    Lower-case a host name and drop a trailing dot. Returns None for anything
+    that is not a valid host name.
     """
-    try:
-        async with session.get(url) as response:
-            response.raise_for_status()
-            return await response.text()
-    except aiohttp.ClientError as e:
-        print(f"Error downloading {url}: {e}")
+    name = name.strip().lower().rstrip('.')
+    if name in LOCAL_NAMES or not _HOSTNAME_RE.match(name):
         return None
+    return name
+
+def parse_hosts_line(line):
+    """
+    Return the host names a hosts file line blocks, as written (not normalized).
+    Handles `address name [name ...]` lines and plain domain lists; comments
+    and lines that point names at a real address are skipped.
+    """
+    line = line.split('#', 1)[0].strip()
+    if not line:
+        return []
+    fields = line.split()
+    if _ADDRESS_RE.match(fields[0].lower()):
+        if fields[0].lower() not in BLOCK_ADDRESSES:
+            return []
+        return fields[1:]
+    # Plain domain lists have one name per line
+    return fields[:1] if len(fields) == 1 else []
 
-async def combine_hosts_files(urls_file_path, combined_hosts_file_path):
+class HostsSource:
+    """
+    The domains of one list. Kept apart until the download has finished, so a
+    list that fails halfway adds nothing, and so the parse can be cached.
+    """
+    def __init__(self, name):
+        self.name = name
+        self.domains = set()
+        self.stats = {'lines': 0, 'entries': 0, 'invalid': 0, 'duplicates': 0}
+        self.cached = False
+        self.bytes = 0
+
+    def add_line(self, line):
+        self.stats['lines'] += 1
+        for name in parse_hosts_line(line):
+            self.stats['entries'] += 1
+            domain = normalize_hostname(name)
+            if domain is None:
+                self.stats['invalid'] += 1
+            elif domain in self.domains:
+                self.stats['duplicates'] += 1
+            else:
+                self.domains.add(domain)
+
+class HostsBlocklist:
+    """
+    Blocked domains collected from any number of sources, deduplicated with a
+    set, with counts of what went in and what was dropped.
+    """
+    def __init__(self):
+        self.domains = set()
+        self.sources = []
+        self.cached = 0
+        self.stats = {'lines': 0, 'entries': 0, 'invalid': 0, 'duplicates': 0, 'collapsed': 0}
+
+    def add(self, source):
+        self.sources.append(source.name)
+        self.cached += source.cached
+        for key, value in source.stats.items():
+            self.stats[key] += value
+        self.stats['duplicates'] += len(source.domains & self.domains)
+        self.domains |= source.domains
+
+    def collapse_subdomains(self):
+        """
+        Drop every domain whose parent domain is blocked as well; blocking a
+        name in a hosts file does not block its subdomains, but resolvers
+        that block by suffix (dnsmasq, unbound) cover them with the parent.
+        """
+        covered = set()
+        for domain in self.domains:
+            labels = domain.split('.')
+            if any('.'.join(labels[i:]) in self.domains for i in range(1, len(labels))):
+                covered.add(domain)
+        self.domains -= covered
+        self.stats['collapsed'] = len(covered)
+
+    def summary(self):
+        stats = self.stats
+        return (f"{len(self.sources)} sources ({self.cached} from cache), {stats['lines']} lines, {stats['entries']} entries -> "
+                f"{len(self.domains)} unique domains ({stats['duplicates']} duplicates, {stats['invalid']} invalid, "
+                f"{stats['collapsed']} covered by a parent domain)")
+
+    def write(self, path, address='0.0.0.0', domains=None):
+        with atomic_open(path) as file:
+            file.write("# Combined hosts file\n")
+            for source in sorted(self.sources):
+                file.write(f"# Source: {source}\n")
+            file.write(f"# {self.summary()}\n\n")
+            for domain in sorted(self.domains) if domains is None else domains:
+                file.write(f"{address} {domain}\n")
+
+@contextlib.contextmanager
+def atomic_open(path):
+    """
+    Open a temporary file next to `path` for writing and move it over `path`
+    once it is complete, so readers only ever see the old or the new file.
+    """
+    temp_path = f"{path}.tmp"
+    try:
+        with open(temp_path, 'w', encoding='utf-8', newline='\n') as file:
+            yield file
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp_path, path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+def diff_sorted(old, new):
+    """
+    Walk two sorted iterables of domains side by side. Returns the domains
+    only in `new` (added) and only in `old` (removed), both sorted.
+    """
+    added, removed = [], []
+    old = iter(old)
+    previous = next(old, None)
+    for domain in new:
+        while previous is not None and previous < domain:
+            removed.append(previous)
+            previous = next(old, None)
+        if previous == domain:
+            previous = next(old, None)
+        else:
+            added.append(domain)
+    while previous is not None:
+        removed.append(previous)
+        previous = next(old, None)
+    return added, removed
+
+class HostsSnapshot:
+    """
+    The domains of the last combined file, sorted, one per line after a JSON
+    line with the settings it was written with. Sorted, it is compared with a
+    new set in one pass without being loaded, and an unchanged set leaves the
+    combined file alone.
+    """
+    def __init__(self, path):
+        self.path = path
+
+    def settings(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as file:
+                return json.loads(file.readline())
+        except (OSError, ValueError):
+            return None
+
+    def domains(self):
+        if self.settings() is None:
+            return
+        with open(self.path, 'r', encoding='utf-8') as file:
+            next(file)
+            for line in file:
+                yield line.rstrip('\n')
+
+    def save(self, domains, settings):
+        with atomic_open(self.path) as file:
+            file.write(json.dumps(settings) + '\n')
+            file.writelines(f"{domain}\n" for domain in domains)
+
+# What a delta's .add and .remove files hold for each domain, per consumer
+DELTA_FORMATS = {
+    'plain': ('{domain}', '{domain}'),
+    'hosts': ('{address} {domain}', '{address} {domain}'),
+    # Lines of a dnsmasq conf-file; '#' answers with the null address
+    'dnsmasq': ('address=/{domain}/#', 'address=/{domain}/#'),
+    # Input for unbound-control local_zones and local_zones_remove
+    'unbound': ('{domain} always_nxdomain', '{domain}'),
+}
+
+def write_delta(path, delta_format, added, removed, address='0.0.0.0'):
+    add_line, remove_line = DELTA_FORMATS[delta_format]
+    for suffix, line, domains in (('add', add_line, added), ('remove', remove_line, removed)):
+        with atomic_open(f"{path}.{suffix}") as file:
+            file.writelines(line.format(domain=domain, address=address) + '\n' for domain in domains)
+
+class HostsCache:
+    """
+    Parsed lists on disk, keyed by URL, with the ETag and Last-Modified the
+    server sent. An unchanged list is answered with 304 Not Modified and read
+    back from here instead of being transferred and parsed again.
+
+    Each URL has a <hash>.domains file (one domain per line) and a <hash>.json
+    entry with the validators, the parse stats and the size of the domains
+    file. Both are replaced atomically, domains first; an entry whose size
+    does not match its domains file is ignored.
+    """
+    def __init__(self, directory, max_age=0):
+        self.directory = directory
+        self.max_age = max_age
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, url):
+        return os.path.join(self.directory, hashlib.sha256(url.encode('utf-8')).hexdigest())
+
+    def entry(self, url):
+        path = self._path(url)
+        try:
+            with open(f"{path}.json", 'r', encoding='utf-8') as file:
+                entry = json.load(file)
+            if entry.get('url') != url or os.path.getsize(f"{path}.domains") != entry['size']:
+                return None
+        except (OSError, ValueError, KeyError):
+            return None
+        return entry
+
+    def is_fresh(self, entry):
+        # Young enough to use without asking the server
+        return entry is not None and time.time() - entry['fetched'] < self.max_age
+
+    def request_headers(self, entry):
+        headers = {}
+        if entry is not None:
+            if entry.get('etag'):
+                headers['If-None-Match'] = entry['etag']
+            if entry.get('last_modified'):
+                headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def read(self, url, entry):
+        source = HostsSource(url)
+        with open(f"{self._path(url)}.domains", 'r', encoding='utf-8') as file:
+            source.domains.update(line.rstrip('\n') for line in file)
+        source.stats.update(entry['stats'])
+        source.cached = True
+        return source
+
+    def _write_entry(self, path, entry):
+        with open(f"{path}.json.tmp", 'w', encoding='utf-8') as file:
+            json.dump(entry, file)
+        os.replace(f"{path}.json.tmp", f"{path}.json")
+
+    def store(self, source, etag, last_modified):
+        path = self._path(source.name)
+        with open(f"{path}.domains.tmp", 'w', encoding='utf-8', newline='\n') as file:
+            file.writelines(f"{domain}\n" for domain in source.domains)
+            size = file.tell()
+        os.replace(f"{path}.domains.tmp", f"{path}.domains")
+        self._write_entry(path, {'url': source.name, 'etag': etag, 'last_modified': last_modified,
+                                 'fetched': time.time(), 'size': size, 'stats': source.stats})
+
+    def touch(self, url, entry):
+        entry['fetched'] = time.time()
+        self._write_entry(self._path(url), entry)
+
+async def read_hosts_response(response, source):
+    # Whole chunks rather than readline(); awaiting once per line costs more than the parsing
+    encoding = response.get_encoding() if response.charset else 'utf-8'
+    decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+    tail = ''
+    async for chunk in response.content.iter_any():
+        source.bytes += len(chunk)
+        lines = (tail + decoder.decode(chunk)).split('\n')
+        tail = lines.pop()
+        for line in lines:
+            source.add_line(line)
+    tail += decoder.decode(b'', final=True)
+    if tail:
+        source.add_line(tail)
+
+async def download_hosts_file(session, url, cache=None, entry=None):
+    """
+    Asynchronously download the hosts file from the given URL, parsing it line
+    by line as it arrives. If the server answers that the cached `entry` is
+    still current, the cached copy is read instead. Raises on failure.
+    """
+    headers = cache.request_headers(entry) if cache else {}
+    async with session.get(url, headers=headers) as response:
+        if response.status == 304 and entry is not None:
+            cache.touch(url, entry)
+            return cache.read(url, entry)
+        response.raise_for_status()
+        source = HostsSource(url)
+        await read_hosts_response(response, source)
+    if cache:
+        try:
+            cache.store(source, response.headers.get('ETag'), response.headers.get('Last-Modified'))
+        except OSError as e:
+            print(f"Error caching {url}: {e}")
+    return source
+
+class HostsFetcher:
+    """
+    Downloads lists with a bounded number of connections, in total and per
+    host, and timeouts on connecting and on each read; time spent waiting for
+    a free connection does not count. Failed attempts are retried with
+    exponential backoff; a list that still fails is taken from the cache,
+    however old. Timing and bytes of every URL end up in `metrics`.
+    """
+    # Client errors other than these will not go away by asking again
+    RETRY_STATUSES = {408, 425, 429}
+
+    def __init__(self, cache=None, jobs=8, per_host=2, connect_timeout=10, read_timeout=60, retries=3, backoff=1.0):
+        self.cache = cache
+        self.jobs = jobs
+        self.per_host = per_host
+        self.timeout = aiohttp.ClientTimeout(total=None, sock_connect=connect_timeout, sock_read=read_timeout)
+        self.retries = retries
+        self.backoff = backoff
+        self.session = None
+        self.metrics = {}
+
+    async def __aenter__(self):
+        connector = aiohttp.TCPConnector(limit=self.jobs, limit_per_host=self.per_host)
+        self.session = aiohttp.ClientSession(connector=connector, timeout=self.timeout)
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.session.close()
+
+    def _retryable(self, error):
+        if isinstance(error, aiohttp.ClientResponseError):
+            return error.status >= 500 or error.status in self.RETRY_STATUSES
+        return True
+
+    async def fetch(self, url):
+        """
+        Returns the parsed source for the URL, or None if neither the server
+        nor the cache has it.
+        """
+        started = time.perf_counter()
+        metrics = self.metrics[url] = {'status': 'failed', 'attempts': 0, 'seconds': 0.0, 'bytes': 0}
+        cache = self.cache
+        entry = cache.entry(url) if cache else None
+        source = None
+        try:
+            if cache and cache.is_fresh(entry):
+                source = cache.read(url, entry)
+                metrics['status'] = 'cached'
+                return source
+            for attempt in range(self.retries + 1):
+                if attempt:
+                    # 1, 2, 4, ... times the backoff, spread out so retries to one host do not line up
+                    await asyncio.sleep(self.backoff * 2 ** (attempt - 1) * random.uniform(1, 1.5))
+                metrics['attempts'] += 1
+                try:
+                    source = await download_hosts_file(self.session, url, cache, entry)
+                    metrics['status'] = 'not modified' if source.cached else 'downloaded'
+                    metrics['bytes'] = source.bytes
+                    return source
+                except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                    reason = str(e) or type(e).__name__
+                    print(f"Error downloading {url} (attempt {attempt + 1}): {reason}")
+                    if not self._retryable(e):
+                        break
+            if entry is not None:
+                source = cache.read(url, entry)
+                metrics['status'] = 'stale cache'
+                print(f"Using the copy of {url} cached {time.ctime(entry['fetched'])}")
+            return source
+        except OSError as e:
+            print(f"Error using the cached copy of {url}: {e}")
+            return None
+        finally:
+            metrics['seconds'] = time.perf_counter() - started
+
+    def report(self):
+        lines = []
+        for url, metrics in sorted(self.metrics.items()):
+            lines.append(f"  {metrics['status']:<12} {metrics['seconds']:7.2f}s {metrics['bytes']:>13,} bytes "
+                         f"{metrics['attempts']} attempt(s)  {url}")
+        total = sum(metrics['bytes'] for metrics in self.metrics.values())
+        lines.append(f"  {total:,} bytes downloaded")
+        return '\n'.join(lines)
+
+async def combine_hosts_files(urls_file_path, combined_hosts_file_path, address='0.0.0.0', collapse=False,
+                              fetcher=None, delta_path=None, delta_format='plain'):
     """
     Combine hosts files from URLs specified in the given text file and save to the combined hosts file.
     """
@@ -29,29 +408,85 @@ async def combine_hosts_files(urls_file_path, combined_hosts_file_path):
         print(f"Error reading {urls_file_path}: {e}")
         return
 
-    combined_hosts_content = ""
+    blocklist = HostsBlocklist()
+    fetcher = fetcher or HostsFetcher()
 
-    async with aiohttp.ClientSession() as session:
-        tasks = [download_hosts_file(session, url) for url in urls]
-        results = await asyncio.gather(*tasks)
+    async with fetcher:
+        tasks = [fetcher.fetch(url) for url in urls]
+        # Merged as each list finishes, so only lists still downloading are held apart
+        for task in asyncio.as_completed(tasks):
+            source = await task
+            if source is not None:
+                blocklist.add(source)
 
-        for url, hosts_content in zip(urls, results):
-            if hosts_content:
-                combined_hosts_content += f"# Start of hosts from {url}\n"
-                combined_hosts_content += hosts_content
-                combined_hosts_content += f"\n# End of hosts from {url}\n\n"
+    if collapse:
+        blocklist.collapse_subdomains()
 
+    failed = sorted(set(urls) - set(blocklist.sources))
+    snapshot = HostsSnapshot(f"{combined_hosts_file_path}.snapshot")
+    settings = {'address': address}
+    domains = sorted(blocklist.domains)
     try:
-        with open(combined_hosts_file_path, 'w') as combined_hosts_file:
-            combined_hosts_file.write(combined_hosts_content)
-        print(f"Combined hosts file saved to {combined_hosts_file_path}")
+        added, removed = diff_sorted(snapshot.domains(), domains)
+        carried = removed if failed else []
+        if carried:
+            # The snapshot does not say which list a domain came from, so none is dropped until every list is read
+            blocklist.domains.update(carried)
+            domains = list(heapq.merge(domains, carried))
+            removed = []
+        print(blocklist.summary())
+        print(fetcher.report())
+        for url in failed:
+            print(f"Failed to read {url}; neither the server nor the cache had it")
+        if carried:
+            print(f"{len(carried)} domains of the last run kept because {len(failed)} of {len(urls)} lists failed")
+        print(f"{len(added)} domains added, {len(removed)} removed since the last run")
+        if not added and not removed and snapshot.settings() == settings and os.path.exists(combined_hosts_file_path):
+            print(f"{combined_hosts_file_path} is up to date")
+        else:
+            blocklist.write(combined_hosts_file_path, address, domains)
+            # After the combined file: if this is lost the next run just writes the same file again
+            snapshot.save(domains, settings)
+            print(f"Combined hosts file saved to {combined_hosts_file_path}")
+        if delta_path:
+            write_delta(delta_path, delta_format, added, removed, address)
+            print(f"Changes saved to {delta_path}.add and {delta_path}.remove")
     except IOError as e:
         print(f"Error writing to {combined_hosts_file_path}: {e}")
 
 def main():
-    urls_file_path = input("Enter the path to the text file containing the URLs of the hosts files: ").strip()
-    combined_hosts_file_path = input("Enter the path where the combined hosts file should be saved: ").strip()
-    asyncio.run(combine_hosts_files(urls_file_path, combined_hosts_file_path))
+    parser = argparse.ArgumentParser(description='Combine and deduplicate hosts blocklists')
+    parser.add_argument('urls_file', nargs='?', help='Text file with one hosts file URL per line')
+    parser.add_argument('output', nargs='?', help='Where to save the combined hosts file')
+    parser.add_argument('--address', default='0.0.0.0', help='Address blocked names point to (default: 0.0.0.0)')
+    parser.add_argument('--collapse-subdomains', action='store_true',
+                        help='Leave out subdomains of blocked domains (for resolvers that block by suffix)')
+    parser.add_argument('--cache-dir', default='hosts_cache', help='Where parsed lists are cached (default: hosts_cache)')
+    parser.add_argument('--no-cache', action='store_true', help='Always download and parse every list in full')
+    parser.add_argument('--max-age', type=int, default=0,
+                        help='Seconds a cached list is used without asking the server whether it changed (default: 0)')
+    parser.add_argument('--jobs', type=int, default=8, help='Downloads running at once (default: 8)')
+    parser.add_argument('--per-host', type=int, default=2, help='Downloads running at once from one host (default: 2)')
+    parser.add_argument('--connect-timeout', type=float, default=10, help='Seconds to connect (default: 10)')
+    parser.add_argument('--read-timeout', type=float, default=60,
+                        help='Seconds to wait for more data from a server (default: 60)')
+    parser.add_argument('--retries', type=int, default=3, help='Retries of a failed download (default: 3)')
+    parser.add_argument('--backoff', type=float, default=1.0,
+                        help='Seconds before the first retry, doubled for each further one (default: 1)')
+    parser.add_argument('--delta', metavar='PATH',
+                        help='Also write the domains added and removed since the last run to PATH.add and PATH.remove')
+    parser.add_argument('--delta-format', choices=sorted(DELTA_FORMATS), default='plain',
+                        help='Line format of the --delta files (default: plain)')
+    args = parser.parse_args()
+
+    urls_file_path = args.urls_file or input("Enter the path to the text file containing the URLs of the hosts files: ").strip()
+    combined_hosts_file_path = args.output or input("Enter the path where the combined hosts file should be saved: ").strip()
+    cache = None if args.no_cache else HostsCache(args.cache_dir, args.max_age)
+    fetcher = HostsFetcher(cache, args.jobs, args.per_host, args.connect_timeout, args.read_timeout, args.retries,
+                           args.backoff)
+    asyncio.run(combine_hosts_files(urls_file_path, combined_hosts_file_path, args.address, args.collapse_subdomains,
+                                    fetcher, args.delta, args.delta_format))
+    return 0
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    sys.exit(main())
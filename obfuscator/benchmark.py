@@ -0,0 +1,305 @@
+import argparse
+import contextlib
+import json
+import multiprocessing
+import os
+import random
+import re
+import string
+import sys
+import tempfile
+import time
+import tracemalloc
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows; peak memory is then only reported with --tracemalloc
+    resource = None
+
+from obfuscate_csharp import CSharpObfuscator, Deobfuscator, compare_trees
+
+PHASES = ('copy', 'scan', 'rewrite', 'project_files', 'maps')
+
+def random_name(rng, length=10):
+    return ''.join(rng.choices(string.ascii_letters, k=length))
+
+def build_maps(rng, size):
+    obfuscation_map = {random_name(rng): f"Symbol{i}" for i in range(size)}
+    string_map = {random_name(rng): f"text {i}" for i in range(size // 4)}
+    namespace_map = {random_name(rng): f"Company.Module{i}" for i in range(max(1, size // 100))}
+    return obfuscation_map, string_map, namespace_map
+
+def build_source(rng, obfuscation_map, string_map, lines):
+    names = list(obfuscation_map)
+    strings = list(string_map) or ['x']
+    out = []
+    for _ in range(lines):
+        out.append(f'    var {rng.choice(names)} = {rng.choice(names)}.{rng.choice(names)}("{rng.choice(strings)}");\n')
+    return ''.join(out)
+
+def legacy_deobfuscate(content, obfuscation_map, string_map, namespace_map):
+    # The per-entry loop deobfuscate_file used before the single-pass matcher
+    for obfuscated, original in obfuscation_map.items():
+        content = re.sub(r'\b' + obfuscated + r'\b', original, content)
+    for obfuscated, original in string_map.items():
+        content = content.replace(f'"{obfuscated}"', f'"{original}"')
+    for obfuscated, original in namespace_map.items():
+        content = content.replace(obfuscated, original)
+    return content
+
+def best_of(repeat, function, *args):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function(*args)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def bench_deobfuscate(map_sizes, lines, repeat, legacy_limit):
+    """
+    Time deobfuscation of one file against maps of growing size.
+    """
+    print(f"{'map size':>10} {'build (s)':>10} {'per file (ms)':>14} {'legacy (ms)':>12}")
+    for size in map_sizes:
+        rng = random.Random(size)
+        maps = build_maps(rng, size)
+        content = build_source(rng, maps[0], maps[1], lines)
+
+        start = time.perf_counter()
+        deobfuscator = Deobfuscator.from_maps(*maps)
+        build_time = time.perf_counter() - start
+
+        per_file = best_of(repeat, deobfuscator.deobfuscate_code, content)
+        legacy = '-'
+        if size <= legacy_limit:
+            legacy = f"{best_of(1, legacy_deobfuscate, content, *maps) * 1000:.1f}"
+        print(f"{size:>10} {build_time:>10.3f} {per_file * 1000:>14.1f} {legacy:>12}")
+
+WORDS = ('alpha', 'bravo', 'charlie', 'delta', 'echo', 'foxtrot', 'golf', 'hotel', 'india', 'juliet',
+         'kilo', 'lima', 'mike', 'november', 'oscar', 'papa', 'quebec', 'romeo', 'sierra', 'tango')
+
+def generate_class(rng, project, file_index, class_index, methods, strings, previous):
+    name = f"Service{project}x{file_index}x{class_index}"
+    texts = [' '.join(rng.choices(WORDS, k=3)) for _ in range(max(1, strings))]
+    out = [f'    /// <summary>Generated class {name}</summary>\n',
+           f'    public class {name} : IService{project}, IDisposable\n    {{\n',
+           f'        private int counter{class_index};\n',
+           f'        private readonly string label{class_index} = "{texts[0]}";\n',
+           f'        public State{project} Current {{ get; set; }}\n\n',
+           f'        public int Run()\n        {{\n            var values = new List<int>();\n'
+           f'            values.Add(counter{class_index});\n'
+           f'            return Step0(values.Where(v => v > 0).Sum());\n        }}\n\n',
+           # Share their names with List<T>.Add and Enumerable.Sum used above, which must keep them
+           f'        public void Add(int value)\n        {{\n            counter{class_index} += value;\n        }}\n\n',
+           f'        public int Sum() => counter{class_index};\n\n',
+           # Framework names used as a named argument, an object initializer member and an interface member
+           f'        public string FileName {{ get; set; }}\n\n',
+           f'        public string Describe(List<string> names) => string.Join(separator: ", ", values: names);\n\n',
+           f'        public ProcessStartInfo Launch() => new ProcessStartInfo {{ FileName = FileName }};\n\n',
+           f'        public void Dispose()\n        {{\n            counter{class_index} = 0;\n        }}\n']
+    for m in range(methods):
+        out.append(f'\n        public int Step{m}(int value{m})\n        {{\n'
+                   f'            var total = value{m} + counter{class_index};\n'
+                   f'            // step {m} of {name}\n'
+                   f'            if (label{class_index} == "{texts[m % len(texts)]}")\n'
+                   f'            {{\n                total += {m};\n            }}\n')
+        if previous and m == methods - 1:
+            out.append(f'            total += new {rng.choice(previous)}().Run();\n')
+        out.append('            return total;\n        }\n')
+    out.append('    }\n')
+    return name, ''.join(out)
+
+def generate_solution(root, projects, files, classes, methods, strings, seed=0):
+    """
+    Write a synthetic solution with `projects` old-style .csproj projects of
+    `files` source files each. Returns the number of source files and lines.
+    """
+    rng = random.Random(seed)
+    os.makedirs(root)
+    sln = ['Microsoft Visual Studio Solution File, Format Version 12.00\n']
+    source_count = 0
+    lines = 0
+    for p in range(projects):
+        project_name = f"Project{p}"
+        project_dir = os.path.join(root, project_name)
+        os.makedirs(os.path.join(project_dir, 'Resources'))
+        with open(os.path.join(project_dir, 'Resources', 'data.bin'), 'wb') as f:
+            f.write(bytes(rng.getrandbits(8) for _ in range(4096)))
+        previous = []
+        # Written with CRLF line endings, which must survive the round trip
+        with open(os.path.join(project_dir, f"IService{p}.cs"), 'w', encoding='utf-8', newline='\r\n') as f:
+            f.write(f"namespace {project_name}.Core\n{{\n    public interface IService{p}\n    {{\n        int Run();\n"
+                    f"    }}\n\n    public enum State{p} {{ Idle, Busy, Done }}\n}}\n")
+        compile_items = [f"IService{p}.cs"]
+        for f_index in range(files):
+            module = f"Module{f_index // 10}"
+            os.makedirs(os.path.join(project_dir, module), exist_ok=True)
+            parts = [f"using System;\nusing System.Collections.Generic;\nusing System.Diagnostics;\n"
+                     f"using System.Linq;\nusing {project_name}.Core;\n\nnamespace {project_name}.{module}\n{{\n"]
+            for c in range(classes):
+                name, text = generate_class(rng, p, f_index, c, methods, strings, previous)
+                parts.append(text)
+                previous.append(f"{project_name}.{module}.{name}")
+            parts.append('}\n')
+            content = ''.join(parts)
+            file_name = f"File{p}x{f_index}.cs"
+            with open(os.path.join(project_dir, module, file_name), 'w', encoding='utf-8') as f:
+                f.write(content)
+            compile_items.append(f"{module}\\{file_name}")
+            lines += content.count('\n')
+        source_count += files + 1
+        items = ''.join(f'    <Compile Include="{item}" />\n' for item in compile_items)
+        with open(os.path.join(project_dir, f"{project_name}.csproj"), 'w', encoding='utf-8') as f:
+            f.write(f'<Project ToolsVersion="15.0">\n  <ItemGroup>\n{items}  </ItemGroup>\n'
+                    f'  <ItemGroup>\n    <None Include="Resources\\data.bin" />\n  </ItemGroup>\n</Project>\n')
+        sln.append(f'Project("{{FAE04EC0-301F-11D3-BF4B-00C04F79EFBC}}") = "{project_name}", '
+                   f'"{project_name}\\{project_name}.csproj", "{{{p:08d}-0000-0000-0000-000000000000}}"\nEndProject\n')
+    with open(os.path.join(root, f"{os.path.basename(root)}.sln"), 'w', encoding='utf-8') as f:
+        f.write(''.join(sln))
+    return source_count, lines
+
+# Framework member uses in every generated class that must survive obfuscation
+FRAMEWORK_USES = ('.Add(', ').Sum()', 'Join(separator: ', ', values: ', '{ FileName = ', ' void Dispose()')
+
+def external_member_failures(output_path):
+    """
+    Return the obfuscated source files in which a framework member used by the
+    generated classes was renamed along with a project symbol of the same name.
+    """
+    failures = []
+    for dir_path, _, file_names in os.walk(output_path):
+        for file_name in file_names:
+            if not file_name.endswith('.cs'):
+                continue
+            with open(os.path.join(dir_path, file_name), 'r', encoding='utf-8') as f:
+                content = f.read()
+            if 'new List<int>()' in content and not all(use in content for use in FRAMEWORK_USES):
+                failures.append(os.path.relpath(os.path.join(dir_path, file_name), output_path))
+    return sorted(failures)
+
+def peak_rss_mb(who):
+    if resource is None:
+        return None
+    peak = resource.getrusage(who).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return peak / (1 << 20) if sys.platform == 'darwin' else peak / (1 << 10)
+
+def run_project_benchmark(config):
+    """
+    Generate one synthetic solution, obfuscate and deobfuscate it and return the measurements.
+    """
+    result = dict(config)
+    with tempfile.TemporaryDirectory() as temp_dir:
+        root = os.path.join(temp_dir, 'Bench')
+        result['files'], result['lines'] = generate_solution(root, config['projects'], config['files_per_project'],
+                                                             config['classes'], config['methods'],
+                                                             config['strings'], config['seed'])
+        if config['tracemalloc']:
+            tracemalloc.start()
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull), \
+                contextlib.redirect_stderr(devnull):
+            obfuscator = CSharpObfuscator('en', seed=config['name_seed'])
+            start = time.perf_counter()
+            output_path = obfuscator.obfuscate_project(root, jobs=config['jobs'], map_format=config['map_format'])
+            result['obfuscate'] = time.perf_counter() - start
+            result['obfuscate_phases'] = obfuscator.timings
+            result['external_member_failures'] = external_member_failures(output_path)
+
+            deobfuscator = CSharpObfuscator('en')
+            restored_path = f"{root}_Deobfuscated"
+            start = time.perf_counter()
+            deobfuscator.deobfuscate_project(output_path, restored_path)
+            result['deobfuscate'] = time.perf_counter() - start
+            result['deobfuscate_phases'] = deobfuscator.timings
+        if config['tracemalloc']:
+            result['traced_peak_mb'] = tracemalloc.get_traced_memory()[1] / (1 << 20)
+            tracemalloc.stop()
+        if resource is not None:
+            result['peak_rss_mb'] = peak_rss_mb(resource.RUSAGE_SELF)
+            result['worker_peak_rss_mb'] = peak_rss_mb(resource.RUSAGE_CHILDREN)
+        result['round_trip_failures'] = compare_trees(root, restored_path)
+    return result
+
+def _run_isolated(config, connection):
+    connection.send(run_project_benchmark(config))
+    connection.close()
+
+def _format_mb(value):
+    return '-' if value is None else f"{value:.0f}"
+
+def bench_project(configs, as_json):
+    """
+    Run every configuration in its own process so that peak memory is measured per configuration.
+    """
+    results = []
+    if not as_json:
+        phases = ' '.join(f"{phase:>13}" for phase in PHASES)
+        print(f"{'files':>7} {'lines':>9} {'obfuscate':>10} {phases} {'deobfuscate':>12} {'peak MB':>8} "
+              f"{'workers MB':>10} {'round trip':>10}")
+    for config in configs:
+        receiver, sender = multiprocessing.Pipe(duplex=False)
+        process = multiprocessing.Process(target=_run_isolated, args=(config, sender))
+        process.start()
+        result = receiver.recv()
+        process.join()
+        results.append(result)
+        if as_json:
+            continue
+        phases = ' '.join(f"{result['obfuscate_phases'].get(phase, 0.0):>13.3f}" for phase in PHASES)
+        failures = result['round_trip_failures'] + result['external_member_failures']
+        status = f"{len(failures)} failed" if failures else 'ok'
+        print(f"{result['files']:>7} {result['lines']:>9} {result['obfuscate']:>10.3f} {phases} "
+              f"{result['deobfuscate']:>12.3f} {_format_mb(result.get('peak_rss_mb')):>8} "
+              f"{_format_mb(result.get('worker_peak_rss_mb')):>10} {status:>10}")
+        for rel_path in result['round_trip_failures'][:10]:
+            print(f"  round trip differs: {rel_path}")
+        for rel_path in result['external_member_failures'][:10]:
+            print(f"  framework member renamed: {rel_path}")
+    if as_json:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+    return 1 if any(result['round_trip_failures'] or result['external_member_failures'] for result in results) else 0
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmarks for the C# obfuscator')
+    subparsers = parser.add_subparsers(dest='benchmark', required=True)
+
+    deobfuscate_parser = subparsers.add_parser('deobfuscate', help='Per-file deobfuscation time versus map size')
+    deobfuscate_parser.add_argument('--map-sizes', type=int, nargs='+', default=[100, 1000, 10000, 100000])
+    deobfuscate_parser.add_argument('--lines', type=int, default=2000, help='Lines in the benchmarked file')
+    deobfuscate_parser.add_argument('--repeat', type=int, default=5)
+    deobfuscate_parser.add_argument('--legacy-limit', type=int, default=10000,
+                                    help='Largest map size to also time with the old per-entry loop')
+
+    project_parser = subparsers.add_parser('project',
+                                           help='End-to-end obfuscation and deobfuscation of a synthetic solution')
+    project_parser.add_argument('--projects', type=int, default=2, help='Projects in the solution')
+    project_parser.add_argument('--files', type=int, nargs='+', default=[50, 200],
+                                help='Source files per project; one run per value')
+    project_parser.add_argument('--classes', type=int, default=3, help='Classes per file')
+    project_parser.add_argument('--methods', type=int, default=5, help='Methods per class')
+    project_parser.add_argument('--strings', type=int, default=3, help='Distinct string literals per class')
+    project_parser.add_argument('--jobs', type=int, default=None, help='Worker processes (default: number of CPUs)')
+    project_parser.add_argument('--map-format', choices=('json', 'sqlite', 'both'), default='json')
+    project_parser.add_argument('--seed', type=int, default=0, help='Seed of the generated solution')
+    project_parser.add_argument('--name-seed', type=int, default=None,
+                                help='Seed for the obfuscated names (default: unseeded, as the obfuscator runs by default)')
+    project_parser.add_argument('--tracemalloc', action='store_true',
+                                help='Also report the traced Python heap peak (slows the run down)')
+    project_parser.add_argument('--json', action='store_true', help='Print the results as JSON')
+
+    args = parser.parse_args()
+    if args.benchmark == 'deobfuscate':
+        bench_deobfuscate(args.map_sizes, args.lines, args.repeat, args.legacy_limit)
+    elif args.benchmark == 'project':
+        configs = [{'projects': args.projects, 'files_per_project': files, 'classes': args.classes,
+                    'methods': args.methods, 'strings': args.strings, 'jobs': args.jobs,
+                    'map_format': args.map_format, 'seed': args.seed, 'name_seed': args.name_seed,
+                    'tracemalloc': args.tracemalloc}
+                   for files in args.files]
+        return bench_project(configs, args.json)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
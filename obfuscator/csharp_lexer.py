@@ -0,0 +1,199 @@
+import re
+
+# Token kinds
+IDENT = 'ident'
+STRING = 'string'
+VERBATIM_STRING = 'verbatim_string'
+RAW_STRING = 'raw_string'
+INTERP_TEXT = 'interp_text'
+CHAR = 'char'
+NUMBER = 'number'
+COMMENT = 'comment'
+PREPROC = 'preproc'
+WHITESPACE = 'ws'
+NEWLINE = 'newline'
+PUNCT = 'punct'
+
+TRIVIA = frozenset((WHITESPACE, NEWLINE, COMMENT, PREPROC))
+
+# Every alternative must, when cut off at the end of the input, still match up
+# to the end of the input. That way an incomplete token is always the last one.
+_TOKEN_RE = re.compile(r'''
+    (?P<preproc>(?<![^\r\n])[ \t]*\#[^\r\n]*)
+  | (?P<ws>[^\S\r\n]+)
+  | (?P<newline>\r\n|\r|\n)
+  | (?P<comment>//[^\r\n]*|/\*[\s\S]*?(?:\*/|\Z))
+  | (?P<raw_interp>\$+(?:"{3,}|"*\Z))
+  | (?P<interp>\$@"|@\$"|\$")
+  | (?P<raw_string>(?P<quotes>"{3,})[\s\S]*?(?:(?P=quotes)(?!")|\Z))
+  | (?P<verbatim_string>@"(?:[^"]|"")*(?:"|\Z))
+  | (?P<string>"(?:[^"\\\r\n]|\\[^\r\n]?)*(?:"|\Z|(?=[\r\n])))
+  | (?P<char>'(?:[^'\\\r\n]|\\[^\r\n]?)*(?:'|\Z|(?=[\r\n])))
+  | (?P<ident>@?[^\W\d]\w*)
+  | (?P<number>\d(?:\w|\.(?=\d)|(?<=[eE])[+-](?=\d))*)
+  | (?P<punct>[\s\S])
+''', re.VERBOSE)
+
+_OPENERS = '([{'
+_CLOSERS = ')]}'
+
+# Longest lookahead in _TOKEN_RE; a token ending closer than this to the end of
+# a chunk could still change when the next chunk arrives
+_LOOKAHEAD = 4
+
+def tokenize(text):
+    """
+    Split C# source into a list of (kind, text) tuples.
+
+    Joining the texts of all tokens reproduces the input exactly. Interpolated
+    strings are split into INTERP_TEXT pieces and the regular tokens of their
+    holes, so identifiers used inside holes are visible to the caller.
+    """
+    tokens = []
+    _scan(text, 0, tokens, in_hole=False)
+    return tokens
+
+def iter_tokens(chunks):
+    """
+    Tokenize text that arrives in chunks, yielding one list of tokens per chunk.
+
+    Only a few characters are held back between chunks: the tokens at the end
+    of a chunk are scanned again together with the next one, so a token that
+    straddles a chunk boundary comes out whole. Joining all tokens gives the
+    same text and, for any chunking, the same tokens as tokenize().
+    """
+    context = ''
+    pending = ''
+    for chunk in chunks:
+        if not chunk:
+            continue
+        # One character before the pending text keeps the preprocessor lookbehind correct
+        text = context + pending + chunk
+        start = len(context)
+        tokens = []
+        cut = _scan(text, start, tokens, in_hole=False, limit=len(text) - _LOOKAHEAD)
+        if cut > start:
+            context = text[cut - 1]
+        pending = text[cut:]
+        if tokens:
+            yield tokens
+    if pending:
+        tokens = []
+        _scan(context + pending, len(context), tokens, in_hole=False)
+        yield tokens
+
+def _scan(text, pos, tokens, in_hole, limit=None):
+    # With a limit, stop before the first top-level token that ends after it and return its start
+    end = len(text)
+    depth = 0
+    while pos < end:
+        if in_hole and depth == 0:
+            ch = text[pos]
+            if ch == '}':
+                return pos
+            if ch == ':' and not text.startswith('::', pos):
+                return pos
+        match = _TOKEN_RE.match(text, pos)
+        kind = match.lastgroup
+        value = match.group()
+        if kind == 'interp' or kind == 'raw_interp':
+            mark = len(tokens)
+            tokens.append((INTERP_TEXT, value))
+            if kind == 'interp':
+                interp_end = _scan_interpolated(text, match.end(), tokens, verbatim='@' in value)
+            else:
+                quotes = value.count('"')
+                interp_end = _scan_raw_interpolated(text, match.end(), tokens, len(value) - quotes, quotes)
+            if limit is not None and interp_end > limit:
+                del tokens[mark:]
+                return pos
+            pos = interp_end
+            continue
+        if limit is not None and match.end() > limit:
+            return pos
+        if kind == PUNCT and in_hole:
+            if value in _OPENERS:
+                depth += 1
+            elif value in _CLOSERS:
+                depth -= 1
+        tokens.append((kind, value))
+        pos = match.end()
+    return pos
+
+def _scan_interpolated(text, pos, tokens, verbatim):
+    end = len(text)
+    start = pos
+    while pos < end:
+        ch = text[pos]
+        if ch == '"':
+            if verbatim and text.startswith('""', pos):
+                pos += 2
+                continue
+            tokens.append((INTERP_TEXT, text[start:pos + 1]))
+            return pos + 1
+        if ch == '\\' and not verbatim:
+            pos += 2
+            continue
+        if (ch == '{' or ch == '}') and text.startswith(ch * 2, pos):
+            pos += 2
+            continue
+        if ch == '{':
+            tokens.append((INTERP_TEXT, text[start:pos + 1]))
+            pos = _scan(text, pos + 1, tokens, in_hole=True)
+            start = pos
+            if pos < end and text[pos] == ':':
+                # Format specifier runs up to the closing brace
+                while pos < end and text[pos] not in '}"':
+                    pos += 1
+            continue
+        if ch == '}':
+            pos += 1
+            continue
+        if not verbatim and ch in '\r\n':
+            break
+        pos += 1
+    pos = min(pos, end)
+    if pos > start:
+        tokens.append((INTERP_TEXT, text[start:pos]))
+    return pos
+
+def _scan_raw_interpolated(text, pos, tokens, dollars, quotes):
+    # $$"""...""": a run of at least `dollars` braces opens a hole with its last `dollars` braces
+    end = len(text)
+    if quotes < 3:
+        # Only at the end of the input, where nothing follows the quotes
+        return pos
+    start = pos
+    while pos < end:
+        ch = text[pos]
+        if ch == '"' and text.startswith('"' * quotes, pos):
+            pos += quotes
+            tokens.append((INTERP_TEXT, text[start:pos]))
+            return pos
+        if ch == '{':
+            run = pos
+            while run < end and text[run] == '{':
+                run += 1
+            if run - pos < dollars:
+                pos = run
+                continue
+            tokens.append((INTERP_TEXT, text[start:run]))
+            pos = _scan(text, run, tokens, in_hole=True)
+            start = pos
+            if pos < end and text[pos] == ':':
+                while pos < end and text[pos] != '}':
+                    pos += 1
+            continue
+        pos += 1
+    if pos > start:
+        tokens.append((INTERP_TEXT, text[start:pos]))
+    return pos
+
+def string_body(kind, value):
+    """
+    Return (prefix, body, suffix) of a STRING or VERBATIM_STRING token.
+    """
+    prefix = '@"' if kind == VERBATIM_STRING else '"'
+    if len(value) > len(prefix) and value.endswith('"'):
+        return prefix, value[len(prefix):-1], '"'
+    return prefix, value[len(prefix):], ''
@@ -0,0 +1,757 @@
+import re
+
+from csharp_lexer import IDENT, PUNCT, NUMBER, STRING, VERBATIM_STRING, RAW_STRING, INTERP_TEXT
+
+# Symbol kinds
+NAMESPACE = 'namespace'
+TYPE = 'type'
+TYPE_PARAMETER = 'type_parameter'
+METHOD = 'method'
+PROPERTY = 'property'
+FIELD = 'field'
+EVENT = 'event'
+ENUM_MEMBER = 'enum_member'
+PARAMETER = 'parameter'
+LOCAL = 'local'
+
+# Kinds that can be reached through member access (x.Name); the others are
+# only ever referenced by their bare name.
+MEMBER_KINDS = frozenset((NAMESPACE, TYPE, METHOD, PROPERTY, FIELD, EVENT, ENUM_MEMBER))
+
+# What a member access is made on: an expression of a named type, the result
+# of calling a method, or a name (variable, member, type or namespace). Named
+# arguments are accessed on the method they are passed to.
+RECEIVER_TYPE = 'type'
+RECEIVER_CALL = 'call'
+RECEIVER_NAME = 'name'
+RECEIVER_METHOD = 'method'
+
+KEYWORDS = frozenset((
+    'abstract', 'as', 'base', 'bool', 'break', 'byte', 'case', 'catch', 'char', 'checked', 'class', 'const',
+    'continue', 'decimal', 'default', 'delegate', 'do', 'double', 'else', 'enum', 'event', 'explicit', 'extern',
+    'false', 'finally', 'fixed', 'float', 'for', 'foreach', 'goto', 'if', 'implicit', 'in', 'int', 'interface',
+    'internal', 'is', 'lock', 'long', 'namespace', 'new', 'null', 'object', 'operator', 'out', 'override',
+    'params', 'private', 'protected', 'public', 'readonly', 'ref', 'return', 'sbyte', 'sealed', 'short',
+    'sizeof', 'stackalloc', 'static', 'string', 'struct', 'switch', 'this', 'throw', 'true', 'try', 'typeof',
+    'uint', 'ulong', 'unchecked', 'unsafe', 'ushort', 'using', 'virtual', 'void', 'volatile', 'while'))
+
+CONTEXTUAL_KEYWORDS = frozenset((
+    'add', 'and', 'alias', 'ascending', 'async', 'await', 'by', 'descending', 'dynamic', 'equals', 'file',
+    'from', 'get', 'global', 'group', 'init', 'into', 'join', 'let', 'managed', 'nameof', 'nint', 'not',
+    'notnull', 'nuint', 'on', 'or', 'orderby', 'partial', 'record', 'remove', 'required', 'scoped', 'select',
+    'set', 'unmanaged', 'value', 'var', 'when', 'where', 'with', 'yield'))
+
+TYPE_KEYWORDS = frozenset((
+    'bool', 'byte', 'char', 'decimal', 'double', 'float', 'int', 'long', 'object', 'sbyte', 'short', 'string',
+    'uint', 'ulong', 'ushort', 'void'))
+
+# Contextual keywords that never start a type
+_NOT_TYPES = CONTEXTUAL_KEYWORDS - {'dynamic', 'nint', 'nuint', 'var', 'value', 'record'}
+
+MODIFIERS = frozenset((
+    'public', 'private', 'protected', 'internal', 'static', 'readonly', 'const', 'override', 'virtual',
+    'abstract', 'sealed', 'async', 'partial', 'extern', 'unsafe', 'volatile', 'new', 'required', 'file',
+    'fixed', 'ref', 'scoped'))
+
+_PARAMETER_MODIFIERS = frozenset(('this', 'ref', 'out', 'in', 'params', 'scoped', 'readonly'))
+_TYPE_DECLARATIONS = frozenset(('class', 'struct', 'interface', 'enum', 'record', 'delegate'))
+_DECLARATION_STARTS = frozenset((None, 'const', 'using', 'fixed', 'readonly', 'static', 'unsafe', 'ref', 'scoped'))
+_LOCAL_FOLLOWS = frozenset(('=', ';', ',', ')', 'in', '=>'))
+_PATTERN_FOLLOWS = frozenset(('&&', '||', '&', '|', ':', 'when', ']', '}', '?'))
+_LAMBDA_PREFIXES = frozenset((None, '(', ',', '=', '=>', 'return', ':', '?', 'async'))
+_QUERY_VARIABLES = frozenset(('from', 'let', 'into', 'join'))
+_NOT_DECLARATIONS = frozenset(('.', 'new', 'typeof', 'sizeof', 'default', 'nameof', 'stackalloc', 'goto', 'as'))
+_OPENERS = {'(': ')', '[': ']', '{': '}'}
+# The lexer emits single-character punctuation; these are re-joined while indexing
+_COMPOUND_OPERATORS = frozenset((
+    '=>', '==', '!=', '<=', '&&', '||', '??', '??=', '::', '?.', '+=', '-=', '*=', '/=', '%=', '&=', '|=', '^='))
+
+def is_name(token):
+    return token[0] == IDENT and token[1] not in KEYWORDS and token[1] not in CONTEXTUAL_KEYWORDS and token[1] != '_'
+
+def _is_type_name(token):
+    kind, value = token
+    return kind == IDENT and (value in TYPE_KEYWORDS or (value not in KEYWORDS and value not in _NOT_TYPES))
+
+def type_start(tokens, end):
+    """
+    Return the index at which a type expression ending at tokens[end] starts,
+    or -1 if tokens[end] does not end a type (e.g. `Dictionary<string, int[]>?`).
+    """
+    j = end
+    while j >= 0:
+        value = tokens[j][1]
+        if value == '?' or value == '*':
+            j -= 1
+        elif value == ']':
+            m = j - 1
+            while m >= 0 and tokens[m][1] == ',':
+                m -= 1
+            if m < 0 or tokens[m][1] != '[':
+                return -1
+            j = m - 1
+        else:
+            break
+    if j < 0:
+        return -1
+    if tokens[j][1] == '>':
+        depth = 0
+        m = j
+        while m >= 0:
+            kind, value = tokens[m]
+            if value == '>':
+                depth += 1
+            elif value == '<':
+                depth -= 1
+                if depth == 0:
+                    break
+            elif kind != IDENT and value not in (',', '.', '?', '[', ']', '(', ')', '::'):
+                return -1
+            m -= 1
+        j = m - 1
+        if j < 0:
+            return -1
+    if not _is_type_name(tokens[j]):
+        return -1
+    # Qualified names: A.B.C, global::A.B
+    while j >= 2 and tokens[j - 1][1] in ('.', '::') and tokens[j - 2][0] == IDENT:
+        j -= 2
+    return j
+
+def type_head(tokens, start, end):
+    """
+    Return the name of the type expression tokens[start:end + 1] without its
+    qualification and type arguments ('List' for System.Collections.Generic.List<int>),
+    or '[]' for an array type.
+    """
+    while end > start and tokens[end][1] in ('?', '*'):
+        end -= 1
+    if tokens[end][1] == ']':
+        return '[]'
+    j = start
+    while j + 2 <= end and tokens[j + 1][1] in ('.', '::') and tokens[j + 2][0] == IDENT:
+        j += 2
+    return tokens[j][1]
+
+def _opening(tokens, close):
+    # Index of the bracket opening tokens[close], or -1
+    open_ = {')': '(', ']': '[', '>': '<'}[tokens[close][1]]
+    depth = 0
+    for i in range(close, -1, -1):
+        value = tokens[i][1]
+        if value == tokens[close][1]:
+            depth += 1
+        elif value == open_:
+            depth -= 1
+            if depth == 0:
+                return i
+    return -1
+
+def _receiver(tokens, dot):
+    """
+    Describe what the member access at tokens[dot] is made on, as a
+    (RECEIVER_*, name) pair, or None if it cannot be told from the tokens.
+    """
+    i = dot - 1
+    while i >= 0 and tokens[i][1] == '!':
+        i -= 1
+    if i < 0:
+        return None
+    kind, value = tokens[i]
+    if kind == IDENT:
+        if value in TYPE_KEYWORDS:
+            return RECEIVER_TYPE, value
+        if value in ('this', 'base') or value in KEYWORDS:
+            return None
+        return RECEIVER_NAME, value
+    if kind in (STRING, VERBATIM_STRING, RAW_STRING, INTERP_TEXT):
+        return RECEIVER_TYPE, 'string'
+    if kind == NUMBER:
+        return RECEIVER_TYPE, 'int'
+    if value == '>':
+        # Foo<T>.Member
+        start = _opening(tokens, i)
+        if start > 0 and tokens[start - 1][0] == IDENT:
+            return RECEIVER_TYPE, tokens[start - 1][1]
+        return None
+    if value != ')':
+        return None
+    start = _opening(tokens, i)
+    j = start - 1
+    if j >= 0 and tokens[j][1] == '>':
+        j = _opening(tokens, j) - 1
+    if start < 0 or j < 0 or tokens[j][0] != IDENT:
+        # A cast or a parenthesised expression
+        return None
+    if j > 0 and tokens[j - 1][1] == 'new':
+        return RECEIVER_TYPE, tokens[j][1]
+    return RECEIVER_CALL, tokens[j][1]
+
+def _callee(tokens, paren):
+    """
+    Describe where the parameters of the method or constructor called with
+    the argument list at tokens[paren] are declared, as (RECEIVER_*, name) pairs.
+    """
+    j = paren - 1
+    if j >= 0 and tokens[j][1] == '>':
+        j = _opening(tokens, j) - 1
+    if j < 0 or tokens[j][0] != IDENT:
+        return []
+    name = tokens[j][1]
+    if j > 0 and tokens[j - 1][1] == 'new':
+        return [(RECEIVER_TYPE, name)] if is_name(tokens[j]) or name in TYPE_KEYWORDS else []
+    if not is_name(tokens[j]):
+        return []
+    callee = [(RECEIVER_METHOD, name)]
+    if j > 0 and tokens[j - 1][1] in ('.', '?.'):
+        receiver = _receiver(tokens, j - 1)
+        if receiver is not None:
+            callee.append(receiver)
+    return callee
+
+def _created_type(tokens):
+    # The T of a statement ending in `new T` or `new T(...)`, whose object initializer follows
+    j = len(tokens) - 1
+    if j >= 0 and tokens[j][1] == ')':
+        j = _opening(tokens, j) - 1
+    if j >= 0 and tokens[j][1] == '>':
+        j = _opening(tokens, j) - 1
+    if j < 0 or not is_name(tokens[j]):
+        return None
+    name = tokens[j][1]
+    while j > 1 and tokens[j - 1][1] in ('.', '::') and tokens[j - 2][0] == IDENT:
+        j -= 2
+    return name if j > 0 and tokens[j - 1][1] == 'new' else None
+
+def _enclosing(tokens, i):
+    # Index of the bracket that tokens[i] is nested in, or -1
+    depth = 0
+    for j in range(i, -1, -1):
+        value = tokens[j][1]
+        if value in (')', ']'):
+            depth += 1
+        elif value in ('(', '['):
+            if depth == 0:
+                return j
+            depth -= 1
+    return -1
+
+def _interfaces(tokens, j, keyword):
+    """
+    Return the names of the interfaces in the base list starting at tokens[j].
+    Only the first base of a class or record can be a class; it is taken to
+    be an interface if it follows the IName convention.
+    """
+    if j >= len(tokens) or tokens[j][1] != ':':
+        return ()
+    end = next((k for k in range(j + 1, len(tokens)) if tokens[k][1] == 'where'), len(tokens))
+    interfaces = []
+    for index, item in enumerate(_split_top_level(tokens, j + 1, end)):
+        if item and item[-1][1] == ')':
+            item = item[:_opening(item, len(item) - 1)]
+        if not item or item[0][0] != IDENT:
+            continue
+        head = type_head(item, 0, len(item) - 1)
+        if index > 0 or keyword in ('struct', 'interface') or re.match(r'I[A-Z]', head):
+            interfaces.append(head)
+    return tuple(interfaces)
+
+def _matching(tokens, start):
+    # Index of the bracket closing tokens[start], or len(tokens) if unbalanced
+    close = _OPENERS[tokens[start][1]]
+    open_ = tokens[start][1]
+    depth = 0
+    for i in range(start, len(tokens)):
+        value = tokens[i][1]
+        if value == open_:
+            depth += 1
+        elif value == close:
+            depth -= 1
+            if depth == 0:
+                return i
+    return len(tokens)
+
+def _matching_angle(tokens, start):
+    depth = 0
+    for i in range(start, len(tokens)):
+        value = tokens[i][1]
+        if value == '<':
+            depth += 1
+        elif value == '>':
+            depth -= 1
+            if depth == 0:
+                return i
+        elif value in (';', '{', '}', '(', '='):
+            break
+    return -1
+
+def _split_top_level(tokens, start, end, separator=','):
+    # Split tokens[start:end] at separators that are not nested in brackets
+    items = []
+    depth = 0
+    item_start = start
+    for i in range(start, end):
+        value = tokens[i][1]
+        if value in _OPENERS or value == '<':
+            depth += 1
+        elif value in (')', ']', '}', '>'):
+            depth -= 1
+        elif value == separator and depth == 0:
+            items.append(tokens[item_start:i])
+            item_start = i + 1
+    items.append(tokens[item_start:end])
+    return items
+
+def _skip_attributes(tokens, i):
+    while i < len(tokens) and tokens[i][1] == '[':
+        i = _matching(tokens, i) + 1
+    return i
+
+class _Scope:
+    __slots__ = ('kind', 'name', 'public', 'interface', 'namespace', 'interfaces', 'initialized')
+
+    def __init__(self, kind, name, public, interface=False, namespace='', interfaces=(), initialized=None):
+        self.kind = kind
+        self.name = name
+        self.public = public
+        self.interface = interface
+        self.namespace = namespace
+        # Interfaces a type implements, and the type an object initializer block sets members of
+        self.interfaces = interfaces
+        self.initialized = initialized
+
+class DeclarationIndexer:
+    """
+    Index the declarations of one C# file from its significant tokens.
+
+    Tokens are consumed one at a time and grouped into statements at `;`,
+    `{` and `}`, with a stack of namespace/type/block scopes, so a file can
+    also be fed in chunks. Every declared namespace, type, member,
+    parameter and local is recorded once with its kind, whether it is part
+    of the public API surface and whether it must keep its name (overrides,
+    extern members, entry points).
+    """
+    def __init__(self):
+        self.symbols = {}
+        # Declared type names per variable, member or method (return type), and
+        # the receivers every member name is accessed on
+        self.types = {}
+        self.accesses = {}
+        self.namespaces = {}
+        self.imports = {}
+        self.scopes = [_Scope(NAMESPACE, '', True)]
+        self.statement = []
+
+    def feed(self, token):
+        kind, value = token
+        if kind == PUNCT:
+            if value in ';{}':
+                self._end_statement(value)
+                return
+            if self.statement:
+                last_kind, last_value = self.statement[-1]
+                if last_kind == PUNCT and last_value + value in _COMPOUND_OPERATORS:
+                    self.statement[-1] = (PUNCT, last_value + value)
+                    return
+        self.statement.append(token)
+
+    def feed_all(self, tokens):
+        for token in tokens:
+            self.feed(token)
+        return self
+
+    def result(self):
+        if self.statement:
+            self._end_statement(None)
+        return {
+            'imports': list(self.imports),
+            'namespaces': list(self.namespaces),
+            'public_namespaces': [name for name, public in self.namespaces.items() if public],
+            'symbols': [[name, kind, public, pinned] for (name, kind), (public, pinned) in self.symbols.items()],
+            'types': {name: sorted(heads) for name, heads in self.types.items()},
+            'accesses': {name: sorted(receivers) for name, receivers in self.accesses.items()},
+        }
+
+    def _add(self, name, kind, public=False, pinned=False):
+        key = (name, kind)
+        previous = self.symbols.get(key)
+        if previous:
+            public = public or previous[0]
+            pinned = pinned or previous[1]
+        self.symbols[key] = (public, pinned)
+
+    def _implements(self, name, interfaces):
+        # A public member may implement a member of an interface declared elsewhere
+        for interface in interfaces:
+            self.accesses.setdefault(name, set()).add((RECEIVER_TYPE, interface))
+
+    def _type(self, name, tokens, start, end):
+        head = type_head(tokens, start, end)
+        if head != 'var':
+            self.types.setdefault(name, set()).add(head)
+
+    def _member_accesses(self, tokens, scope):
+        # x.Name, named arguments f(name: ...) and object initializers new T { Name = ... }
+        for i in range(1, len(tokens) - 1):
+            value = tokens[i][1]
+            if value in ('.', '?.') and tokens[i + 1][0] == IDENT:
+                receiver = _receiver(tokens, i)
+                if receiver is not None:
+                    self.accesses.setdefault(tokens[i + 1][1], set()).add(receiver)
+            elif value == ':' and i > 1 and is_name(tokens[i - 1]) and tokens[i - 2][1] in ('(', ','):
+                paren = _enclosing(tokens, i - 2)
+                if paren >= 0 and tokens[paren][1] == '(':
+                    self.accesses.setdefault(tokens[i - 1][1], set()).update(_callee(tokens, paren))
+        if scope.initialized is not None:
+            for item in _split_top_level(tokens, 0, len(tokens)):
+                if len(item) > 1 and is_name(item[0]) and item[1][1] == '=':
+                    self.accesses.setdefault(item[0][1], set()).add((RECEIVER_TYPE, scope.initialized))
+
+    def _end_statement(self, boundary):
+        tokens = self.statement
+        self.statement = []
+        scope = self.scopes[-1]
+        opened = self._analyze(tokens, scope, boundary) if tokens else None
+        self._member_accesses(tokens, scope)
+        if boundary == '{':
+            self.scopes.append(opened or _Scope('block', None, False, namespace=scope.namespace,
+                                                initialized=_created_type(tokens)))
+        elif boundary == '}' and len(self.scopes) > 1:
+            self.scopes.pop()
+
+    def _is_public(self, modifiers, scope):
+        if scope.interface and not modifiers & {'private', 'protected', 'internal', 'public'}:
+            accessible = True
+        else:
+            accessible = 'public' in modifiers or 'protected' in modifiers
+        return accessible and scope.public
+
+    def _analyze(self, tokens, scope, boundary):
+        if scope.kind == 'enum':
+            self._enum_members(tokens, scope)
+            return None
+
+        i = _skip_attributes(tokens, 0)
+        modifiers = set()
+        while i < len(tokens) and tokens[i][0] == IDENT and tokens[i][1] in MODIFIERS:
+            # `ref` and `scoped` only count as modifiers in front of a type
+            modifiers.add(tokens[i][1])
+            i += 1
+        if i >= len(tokens):
+            return None
+        first = tokens[i][1]
+
+        if first == 'using' and scope.kind == NAMESPACE:
+            self._using(tokens, i)
+        elif first == 'namespace':
+            name = '.'.join(token[1] for token in tokens[i + 1:] if token[0] == IDENT)
+            if name:
+                self.namespaces.setdefault(name, False)
+            if boundary == '{':
+                return _Scope(NAMESPACE, name, True, namespace=name)
+            # File-scoped namespace
+            scope.namespace = name
+        elif first in _TYPE_DECLARATIONS and tokens[i][0] == IDENT and scope.kind != 'block':
+            return self._type_declaration(tokens, i, modifiers, scope, boundary)
+        elif scope.kind == TYPE:
+            self._member(tokens, i, modifiers, scope, boundary)
+        else:
+            self._locals(tokens, boundary)
+        return None
+
+    def _using(self, tokens, i):
+        # using-directives only; skip using-statements and using-declarations
+        last_name = None
+        for kind, value in tokens[i + 1:]:
+            if value in ('(', 'var'):
+                return
+            if kind == IDENT:
+                last_name = value
+        if last_name:
+            self.imports[last_name] = None
+
+    def _mark_namespace_public(self, scope):
+        for outer in reversed(self.scopes):
+            if outer.namespace:
+                self.namespaces[outer.namespace] = True
+                return
+
+    def _type_parameters(self, tokens, start, public):
+        end = _matching_angle(tokens, start)
+        for item in _split_top_level(tokens, start + 1, end if end > 0 else start + 1):
+            names = [token for token in item if is_name(token)]
+            if names:
+                self._add(names[-1][1], TYPE_PARAMETER, public)
+        return end + 1 if end > 0 else start + 1
+
+    def _parameters(self, tokens, start, kind, public, implicit=False):
+        """
+        Record the parameters in the bracket group opening at tokens[start].
+        """
+        end = _matching(tokens, start)
+        for item in _split_top_level(tokens, start + 1, end):
+            j = _skip_attributes(item, 0)
+            while j < len(item) and item[j][1] in _PARAMETER_MODIFIERS:
+                j += 1
+            item = item[j:]
+            for k, token in enumerate(item):
+                if token[1] == '=':
+                    item = item[:k]
+                    break
+            if not item or not is_name(item[-1]):
+                continue
+            if len(item) == 1 and implicit:
+                self._add(item[-1][1], kind, public)
+            elif len(item) > 1 and type_start(item, len(item) - 2) == 0:
+                self._add(item[-1][1], kind, public)
+                self._type(item[-1][1], item, 0, len(item) - 2)
+        return end
+
+    def _type_declaration(self, tokens, i, modifiers, scope, boundary):
+        keyword = tokens[i][1]
+        if keyword == 'record' and i + 1 < len(tokens) and tokens[i + 1][1] in ('struct', 'class'):
+            i += 1
+        public = self._is_public(modifiers, scope)
+
+        if keyword == 'delegate':
+            for j in range(i + 1, len(tokens)):
+                if tokens[j][1] == '(':
+                    name_index = j - 1
+                    if tokens[name_index][1] == '>':
+                        depth = 0
+                        while name_index > i:
+                            value = tokens[name_index][1]
+                            depth += value == '>'
+                            depth -= value == '<'
+                            name_index -= 1
+                            if depth == 0:
+                                break
+                        self._type_parameters(tokens, name_index + 1, public)
+                    if is_name(tokens[name_index]):
+                        self._add(tokens[name_index][1], TYPE, public)
+                    self._parameters(tokens, j, PARAMETER, public)
+                    break
+            return None
+
+        if i + 1 >= len(tokens) or not is_name(tokens[i + 1]):
+            return None
+        name = tokens[i + 1][1]
+        self._add(name, TYPE, public)
+        if public:
+            self._mark_namespace_public(scope)
+        j = i + 2
+        if j < len(tokens) and tokens[j][1] == '<':
+            j = self._type_parameters(tokens, j, public)
+        if j < len(tokens) and tokens[j][1] == '(':
+            # Primary constructor; record parameters become public properties
+            j = self._parameters(tokens, j, PROPERTY if keyword == 'record' else PARAMETER, public) + 1
+        if boundary != '{':
+            return None
+        kind = 'enum' if keyword == 'enum' else TYPE
+        return _Scope(kind, name, public, interface=keyword == 'interface', namespace=scope.namespace,
+                      interfaces=_interfaces(tokens, j, keyword))
+
+    def _enum_members(self, tokens, scope):
+        for item in _split_top_level(tokens, 0, len(tokens)):
+            j = _skip_attributes(item, 0)
+            if j < len(item) and is_name(item[j]):
+                self._add(item[j][1], ENUM_MEMBER, scope.public)
+
+    def _member(self, tokens, i, modifiers, scope, boundary):
+        count = len(tokens)
+        public = self._is_public(modifiers, scope)
+        pinned = 'override' in modifiers or 'extern' in modifiers
+        interfaces = scope.interfaces if 'public' in modifiers else ()
+        kind = FIELD
+        if tokens[i][1] == 'event':
+            kind = EVENT
+            i += 1
+        if i >= count:
+            return
+
+        for j in range(i, count):
+            value = tokens[j][1]
+            if value == 'operator':
+                for k in range(j, count):
+                    if tokens[k][1] == '(':
+                        self._parameters(tokens, k, PARAMETER, public)
+                        break
+                return
+            if value == 'this' and j + 1 < count and tokens[j + 1][1] == '[':
+                self._parameters(tokens, j + 1, PARAMETER, public)
+                return
+            if value == '(':
+                self._method(tokens, i, j, modifiers, public, pinned, interfaces)
+                return
+            if value in ('=', '=>'):
+                break
+
+        arrow = next((j for j in range(i, count) if tokens[j][1] == '=>'), None)
+        if arrow is not None and arrow > i and is_name(tokens[arrow - 1]) and type_start(tokens, arrow - 2) == i:
+            self._add(tokens[arrow - 1][1], PROPERTY if kind == FIELD else kind, public, pinned)
+            self._type(tokens[arrow - 1][1], tokens, i, arrow - 2)
+            self._implements(tokens[arrow - 1][1], interfaces)
+            return
+        if boundary == '{' and is_name(tokens[-1]) and type_start(tokens, count - 2) == i:
+            self._add(tokens[-1][1], PROPERTY if kind == FIELD else kind, public, pinned)
+            self._type(tokens[-1][1], tokens, i, count - 2)
+            self._implements(tokens[-1][1], interfaces)
+            return
+        self._declarators(tokens, i, kind, public, pinned, interfaces if kind == EVENT else ())
+
+    def _method(self, tokens, i, paren, modifiers, public, pinned, interfaces=()):
+        name_index = paren - 1
+        if tokens[name_index][1] == '>':
+            depth = 0
+            while name_index > i:
+                value = tokens[name_index][1]
+                depth += value == '>'
+                depth -= value == '<'
+                name_index -= 1
+                if depth == 0:
+                    break
+            self._type_parameters(tokens, name_index + 1, public)
+        self._parameters(tokens, paren, PARAMETER, public)
+        if name_index <= i or not is_name(tokens[name_index]) or tokens[name_index - 1][1] in ('.', '~'):
+            # Constructor, finalizer or explicit interface implementation
+            return
+        if type_start(tokens, name_index - 1) != i:
+            return
+        name = tokens[name_index][1]
+        entry_point = name == 'Main' and 'static' in modifiers
+        self._add(name, METHOD, public, pinned or entry_point)
+        self._type(name, tokens, i, name_index - 1)
+        self._implements(name, interfaces)
+
+    def _declarators(self, tokens, start, kind, public, pinned=False, interfaces=()):
+        """
+        Record `Type a = 1, b, c = 2` style declarators whose type starts at `start`.
+        """
+        count = len(tokens)
+        first = None
+        for j in range(start + 1, count):
+            if is_name(tokens[j]) and (j + 1 == count or tokens[j + 1][1] in ('=', ',', ';')):
+                if type_start(tokens, j - 1) == start:
+                    first = j
+                break
+        if first is None:
+            return
+        self._add(tokens[first][1], kind, public, pinned)
+        self._type(tokens[first][1], tokens, start, first - 1)
+        self._implements(tokens[first][1], interfaces)
+        for item in _split_top_level(tokens, first + 1, count)[1:]:
+            if item and is_name(item[0]) and (len(item) == 1 or item[1][1] == '='):
+                self._add(item[0][1], kind, public, pinned)
+                self._type(item[0][1], tokens, start, first - 1)
+                self._implements(item[0][1], interfaces)
+
+    def _locals(self, tokens, boundary):
+        count = len(tokens)
+        end_follow = ';' if boundary == ';' else None
+        for i, token in enumerate(tokens):
+            value = token[1]
+            if value == '=>' and i > 0 and tokens[i - 1][1] == ')':
+                # Parenthesised lambda parameters
+                depth = 0
+                for j in range(i - 1, -1, -1):
+                    depth += tokens[j][1] == ')'
+                    depth -= tokens[j][1] == '('
+                    if depth == 0:
+                        self._parameters(tokens, j, LOCAL, False, implicit=True)
+                        break
+                continue
+            if value == '(' and i > 0:
+                self._local_function(tokens, i, boundary)
+                continue
+            if value == 'var' and i + 1 < count and tokens[i + 1][1] == '(':
+                # Deconstruction: var (a, b) = ...
+                self._parameters(tokens, i + 1, LOCAL, False, implicit=True)
+                continue
+            if not is_name(token):
+                continue
+            previous = tokens[i - 1][1] if i > 0 else None
+            follow = tokens[i + 1][1] if i + 1 < count else end_follow
+
+            if previous in _QUERY_VARIABLES or (follow == '=>' and previous in _LAMBDA_PREFIXES):
+                self._add(value, LOCAL)
+                continue
+            if follow not in _LOCAL_FOLLOWS and follow not in _PATTERN_FOLLOWS:
+                continue
+            start = type_start(tokens, i - 1) if i > 0 else -1
+            if start < 0:
+                continue
+            before = tokens[start - 1][1] if start > 0 else None
+            if follow in _PATTERN_FOLLOWS and before not in ('is', 'case'):
+                continue
+            if before in _NOT_DECLARATIONS:
+                continue
+            self._add(value, LOCAL)
+            self._local_type(value, tokens, start, i)
+            if before in _DECLARATION_STARTS or (before == '(' and start > 1
+                                                 and tokens[start - 2][1] in ('for', 'using', 'fixed')):
+                for item in _split_top_level(tokens, i + 1, count)[1:]:
+                    if item and is_name(item[0]) and (len(item) == 1 or item[1][1] == '='):
+                        self._add(item[0][1], LOCAL)
+                        self._type(item[0][1], tokens, start, i - 1)
+
+    def _local_type(self, name, tokens, start, i):
+        # `var x = new T(...)` is a T; other `var` locals have no known type
+        if tokens[start][1] != 'var' or i != start + 1:
+            self._type(name, tokens, start, i - 1)
+            return
+        j = i + 3
+        if i + 1 < len(tokens) and tokens[i + 1][1] == '=' and tokens[i + 2][1] == 'new' and j < len(tokens) \
+                and tokens[j][0] == IDENT:
+            while j + 2 < len(tokens) and tokens[j + 1][1] == '.' and tokens[j + 2][0] == IDENT:
+                j += 2
+            self.types.setdefault(name, set()).add(tokens[j][1])
+
+    def _local_function(self, tokens, paren, boundary):
+        name_index = paren - 1
+        if not is_name(tokens[name_index]) or name_index < 1:
+            return
+        start = type_start(tokens, name_index - 1)
+        if start < 0 or (start > 0 and tokens[start - 1][1] not in MODIFIERS):
+            return
+        close = _matching(tokens, paren)
+        after = tokens[close + 1][1] if close + 1 < len(tokens) else (boundary if boundary == '{' else None)
+        if after not in ('{', '=>', 'where'):
+            return
+        self._add(tokens[name_index][1], METHOD)
+        self._type(tokens[name_index][1], tokens, start, name_index - 1)
+        self._parameters(tokens, paren, PARAMETER, False)
+
+def externally_accessed(scan):
+    """
+    Return the names a (merged) scan accesses as members of something whose
+    type the project does not declare: `items.Add` on a List<T>, `Console.Write`,
+    the result of calling a framework method, a named argument of a framework
+    method, an object initializer of a framework type, or a member of a type
+    implementing a framework interface. A declared symbol with such a name
+    must keep it, since names are renamed without regard to what they refer to.
+
+    Receivers of unknown type (`var` locals not initialised with `new`,
+    lambda parameters, indexers) are taken to be project types.
+    """
+    declared = {}
+    for name, kind, _, _ in scan['symbols']:
+        declared.setdefault(name, set()).add(kind)
+    project_types = {name for name, kinds in declared.items() if TYPE in kinds}
+    namespace_parts = {part for namespace in scan['namespaces'] for part in namespace.split('.')}
+    types = scan['types']
+
+    def external(receiver, name):
+        if receiver == RECEIVER_TYPE:
+            return name not in project_types
+        if receiver == RECEIVER_METHOD:
+            return METHOD not in declared.get(name, ())
+        if receiver == RECEIVER_CALL and METHOD not in declared.get(name, ()):
+            return True
+        if receiver == RECEIVER_NAME and (name in project_types or name in namespace_parts):
+            return False
+        if name in types:
+            return any(head not in project_types for head in types[name])
+        return name not in declared
+
+    return {name for name, receivers in scan['accesses'].items()
+            if any(external(receiver, receiver_name) for receiver, receiver_name in receivers)}
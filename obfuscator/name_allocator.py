@@ -0,0 +1,87 @@
+import hmac
+import hashlib
+import random
+import string
+from itertools import count
+
+from csharp_symbols import KEYWORDS, CONTEXTUAL_KEYWORDS
+
+IDENTIFIER_FIRST = string.ascii_letters
+IDENTIFIER_CHARS = string.ascii_letters + string.digits
+# File names stay lowercase so they cannot collide on case-insensitive file systems
+FILE_NAME_FIRST = string.ascii_lowercase
+FILE_NAME_CHARS = string.ascii_lowercase + string.digits
+
+RESERVED_IDENTIFIERS = KEYWORDS | CONTEXTUAL_KEYWORDS
+RESERVED_FILE_NAMES = frozenset(
+    ['con', 'prn', 'aux', 'nul'] + [f"{device}{i}" for device in ('com', 'lpt') for i in range(10)])
+
+class NameAllocator:
+    """
+    Hands out collision-free names.
+
+    By default names are allocated in order of length (a, b, ..., aa, ab, ...)
+    so the first requests get the shortest names; the alphabet order is
+    shuffled by `seed`, so the same seed and the same request order always
+    give the same names. With a `key`, each name is instead derived from a
+    keyed hash of the original, which does not depend on allocation order.
+    Allocators that are given the same `used` set never hand out the same name.
+    """
+    def __init__(self, seed=None, key=None, first_chars=IDENTIFIER_FIRST, chars=IDENTIFIER_CHARS,
+                 reserved=RESERVED_IDENTIFIERS, hash_length=6, used=None):
+        rng = random.Random(seed)
+        self.first_chars = list(first_chars)
+        self.chars = list(chars)
+        if seed is not None:
+            rng.shuffle(self.first_chars)
+            rng.shuffle(self.chars)
+        self.key = key.encode('utf-8') if isinstance(key, str) else key
+        self.hash_length = hash_length
+        self.reserved = set(reserved)
+        self.used = set() if used is None else used
+        self.next_index = 0
+
+    def reserve(self, names):
+        self.reserved.update(names)
+
+    def claim(self, names):
+        # Names already handed out by an earlier run
+        self.used.update(names)
+
+    def _nth_name(self, index):
+        length = 1
+        size = len(self.first_chars)
+        while index >= size:
+            index -= size
+            length += 1
+            size *= len(self.chars)
+        size //= len(self.first_chars)
+        first, index = divmod(index, size)
+        chars = [self.first_chars[first]]
+        for _ in range(length - 1):
+            size //= len(self.chars)
+            position, index = divmod(index, size)
+            chars.append(self.chars[position])
+        return ''.join(chars)
+
+    def _hashed_name(self, original, attempt):
+        digest = hmac.new(self.key, f"{original}\0{attempt}".encode('utf-8'), hashlib.sha256).digest()
+        value = int.from_bytes(digest, 'big')
+        value, first = divmod(value, len(self.first_chars))
+        chars = [self.first_chars[first]]
+        for _ in range(self.hash_length - 1):
+            value, position = divmod(value, len(self.chars))
+            chars.append(self.chars[position])
+        return ''.join(chars)
+
+    def allocate(self, original=None):
+        if self.key is not None:
+            candidates = (self._hashed_name(original, attempt) for attempt in count())
+        else:
+            candidates = (self._nth_name(index) for index in count(self.next_index))
+        for name in candidates:
+            if self.key is None:
+                self.next_index += 1
+            if name not in self.used and name not in self.reserved:
+                self.used.add(name)
+                return name
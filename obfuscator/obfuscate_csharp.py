@@ -1,16 +1,46 @@
 import os
 import re
 import json
-import random
-import string
+import hashlib
 import shutil
+import sqlite3
+import fnmatch
 import locale
 import argparse
 import subprocess
 import sys
 import getpass
-import xml.etree.ElementTree as ET
+import time
+import tempfile
+import contextlib
+import socketserver
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from tqdm import tqdm
+from symbol_store import SymbolMapStore, write_store, STORE_FILE
+from csharp_lexer import (tokenize, iter_tokens, string_body, IDENT, STRING, VERBATIM_STRING,
+                          COMMENT, PUNCT, TRIVIA)
+from csharp_symbols import DeclarationIndexer, MEMBER_KINDS, externally_accessed
+from name_allocator import NameAllocator, FILE_NAME_FIRST, FILE_NAME_CHARS, RESERVED_FILE_NAMES
+
+MAP_FILE = "obfuscation_map.json"
+CACHE_FILE = "obfuscation_cache.json"
+CACHE_VERSION = 4
+
+# Build output that is never needed in an obfuscated copy
+DEFAULT_EXCLUDES = ('bin', 'obj', '.vs')
+LINK_MODES = ('hardlink', 'reflink', 'copy')
+MAP_FORMATS = ('json', 'sqlite', 'both')
+FICLONE = 0x40049409
+# Keeps its name so project templates and build tooling still find it
+ASSEMBLY_INFO_FILE = 'AssemblyInfo.cs'
+# Source files larger than this are scanned and rewritten chunk by chunk
+STREAMING_THRESHOLD = 16 << 20
+CHUNK_SIZE = 1 << 20
+
+# A source file named in a project or solution file: an Include/Remove/Update
+# value, DependentUpon text or a solution item. File names may contain spaces;
+# globs are left alone.
+_SOURCE_REFERENCE_RE = re.compile(r'(?<=["\\/>;])(?P<name>[^\\/"<>;*?\r\n]+)(?P<ext>\.cs)(?=["<;])')
 
 def run_with_elevated_privileges(command):
     if sys.platform.startswith('win'):
@@ -38,13 +68,522 @@ def ensure_permissions(path):
         print(f"Failed to set permissions: {e}")
         sys.exit(1)
 
+def require_writable(path):
+    """
+    Fail instead of escalating privileges; used by the non-interactive commands.
+    """
+    if not os.access(path, os.W_OK):
+        raise PermissionError(f"Not writable: {path} (fix the permissions or use the interactive menu)")
+
+def deobfuscated_path(obfuscated_path):
+    obfuscated_path = os.path.abspath(obfuscated_path)
+    output_path = obfuscated_path.replace("_Obfuscated", "_Deobfuscated")
+    return output_path if output_path != obfuscated_path else f"{obfuscated_path}_Deobfuscated"
+
+def strip_comments(content):
+    return ''.join(value for kind, value in tokenize(content) if kind != COMMENT)
+
+def compare_trees(original_path, restored_path, exclude=DEFAULT_EXCLUDES):
+    """
+    Compare a deobfuscated tree with the original sources. Comments are not
+    expected to survive obfuscation. Returns the relative paths that differ.
+    """
+    tree = walk_project(original_path, exclude)
+    mismatches = []
+    for rel_path in tree['sources'] + tree['projects'] + tree['assets']:
+        try:
+            with open(os.path.join(restored_path, rel_path), 'rb') as f:
+                actual = f.read()
+        except FileNotFoundError:
+            mismatches.append(rel_path)
+            continue
+        with open(os.path.join(original_path, rel_path), 'rb') as f:
+            expected = f.read()
+        if rel_path.endswith('.cs'):
+            expected = strip_comments(expected.decode('utf-8')).encode('utf-8')
+        if expected != actual:
+            mismatches.append(rel_path)
+    return mismatches
+
+def read_maps(path):
+    """
+    Read the obfuscation maps (original -> obfuscated) stored in an output
+    directory, preferring the JSON map over the SQLite store.
+    """
+    map_path = os.path.join(path, MAP_FILE)
+    if os.path.exists(map_path) or not os.path.exists(os.path.join(path, STORE_FILE)):
+        with open(map_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    with SymbolMapStore(os.path.join(path, STORE_FILE)) as store:
+        return store.load()
+
+def walk_project(project_path, exclude=()):
+    """
+    Walk a project once and sort its files into C# sources, solution/project
+    files and other assets. Directories and files whose name or relative
+    path matches one of the `exclude` globs are skipped.
+    """
+    tree = {'dirs': [], 'sources': [], 'projects': [], 'assets': []}
+
+    def excluded(rel_path):
+        rel_path = rel_path.replace(os.sep, '/')
+        name = rel_path.rsplit('/', 1)[-1]
+        return any(fnmatch.fnmatch(name, pattern) or fnmatch.fnmatch(rel_path, pattern) for pattern in exclude)
+
+    for root, dirs, files in os.walk(project_path):
+        rel_root = os.path.relpath(root, project_path)
+        dirs[:] = sorted(d for d in dirs if not excluded(os.path.normpath(os.path.join(rel_root, d))))
+        tree['dirs'].append(rel_root)
+        for file in sorted(files):
+            rel_path = os.path.normpath(os.path.join(rel_root, file))
+            if excluded(rel_path):
+                continue
+            if file.endswith('.cs'):
+                tree['sources'].append(rel_path)
+            elif file.endswith(('.sln', '.csproj')):
+                tree['projects'].append(rel_path)
+            else:
+                tree['assets'].append(rel_path)
+    return tree
+
+def open_output(path, newline=None):
+    # Never write through a hardlink that may still share its inode with the source
+    if os.path.lexists(path):
+        os.remove(path)
+    return open(path, 'w', encoding='utf-8', newline=newline)
+
+def write_output(path, content, newline=None):
+    with open_output(path, newline) as file:
+        file.write(content)
+
+def read_chunks(file, size=CHUNK_SIZE):
+    return iter(lambda: file.read(size), '')
+
+def is_large(path):
+    return os.path.getsize(path) > STREAMING_THRESHOLD
+
+def _reflink(src, dst):
+    try:
+        import fcntl
+    except ImportError:
+        return False
+    try:
+        with open(src, 'rb') as source, open(dst, 'wb') as target:
+            fcntl.ioctl(target.fileno(), FICLONE, source.fileno())
+    except OSError:
+        return False
+    shutil.copystat(src, dst)
+    return True
+
+def link_or_copy(src, dst, link_mode='hardlink'):
+    """
+    Create dst as a hardlink or reflink of src, falling back to a plain copy.
+    """
+    if os.path.lexists(dst):
+        os.remove(dst)
+    if link_mode == 'hardlink':
+        try:
+            os.link(src, dst)
+            return
+        except OSError:
+            pass
+    elif link_mode == 'reflink' and _reflink(src, dst):
+        return
+    shutil.copy2(src, dst)
+
+def file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for block in iter(lambda: file.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def load_allowlist(path):
+    """
+    Read names and glob patterns (one per line, # starts a comment) that must never be renamed.
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        lines = (line.split('#', 1)[0].strip() for line in f)
+        return [line for line in lines if line]
+
+def rename_fingerprint(scan, names, member_names, strings, namespaces):
+    """
+    Hash of every rename that applies to a scanned file. A file whose content
+    and fingerprint are unchanged does not need to be rewritten.
+    """
+    digest = hashlib.sha256()
+    for name in sorted(scan['identifiers']):
+        digest.update(f"{name}={names.get(name, '')}:{name in member_names}\n".encode('utf-8'))
+    for value in scan['strings']:
+        digest.update(f"{value}={strings.get(value, '')}\n".encode('utf-8'))
+    for namespace in sorted(namespaces):
+        digest.update(f"{namespace}={namespaces[namespace]}\n".encode('utf-8'))
+    return digest.hexdigest()
+
+def significant_tokens(tokens):
+    return [token for token in tokens if token[0] not in TRIVIA]
+
+def rewrite_tokens(tokens, names, rename_string=None, namespaces=None, strip_comments=True, member_names=None):
+    """
+    Rewrite a token list in a single pass.
+
+    Identifiers are looked up in `names`, dotted namespace references in
+    `namespaces` and the bodies of regular and verbatim string literals are
+    passed to `rename_string`. If `member_names` is given, an identifier
+    right after a `.` is only renamed when it is in that set. Comments are
+    dropped unless `strip_comments` is False; everything else is copied
+    unchanged.
+    """
+    namespaces = namespaces or {}
+    namespace_heads = {namespace.split('.', 1)[0] for namespace in namespaces}
+    out = []
+    i = 0
+    count = len(tokens)
+    after_dot = False
+    while i < count:
+        kind, value = tokens[i]
+        if kind == IDENT:
+            if value in namespace_heads and not after_dot:
+                # Longest dotted chain without whitespace that names a namespace
+                j, chain, match_end, replacement = i, value, None, None
+                while True:
+                    if chain in namespaces:
+                        match_end, replacement = j, namespaces[chain]
+                    if j + 2 < count and tokens[j + 1] == (PUNCT, '.') and tokens[j + 2][0] == IDENT:
+                        j += 2
+                        chain = f"{chain}.{tokens[j][1]}"
+                    else:
+                        break
+                if match_end is not None:
+                    out.append(replacement)
+                    i = match_end + 1
+                    continue
+            name = value[1:] if value[0] == '@' else value
+            if after_dot and member_names is not None and name not in member_names:
+                out.append(value)
+            else:
+                out.append(names.get(name, value))
+            after_dot = False
+        elif kind == PUNCT:
+            out.append(value)
+            after_dot = value == '.'
+        elif kind == STRING or kind == VERBATIM_STRING:
+            if rename_string is not None:
+                prefix, body, suffix = string_body(kind, value)
+                new_body = rename_string(body)
+                out.append(value if new_body is None else f"{prefix}{new_body}{suffix}")
+            else:
+                out.append(value)
+            after_dot = False
+        elif kind != COMMENT or not strip_comments:
+            out.append(value)
+            if kind not in TRIVIA:
+                after_dot = False
+        i += 1
+    return ''.join(out)
+
+def _open_tail(tokens):
+    # Start of the trailing identifiers, dots and trivia that the next tokens may still extend
+    i = len(tokens)
+    while i and (tokens[i - 1][0] == IDENT or tokens[i - 1][0] in TRIVIA or tokens[i - 1] == (PUNCT, '.')):
+        i -= 1
+    return i
+
+def rewrite_chunks(chunks, names, rename_string=None, namespaces=None, strip_comments=True, member_names=None):
+    """
+    rewrite_tokens for text arriving in chunks, yielding the output piece by
+    piece. Only the tokens of the current chunk and a trailing run of
+    identifiers, dots and trivia (a dotted name that may continue in the next
+    chunk) are held in memory.
+    """
+    pending = []
+    for tokens in iter_tokens(chunks):
+        pending.extend(tokens)
+        cut = _open_tail(pending)
+        if cut:
+            yield rewrite_tokens(pending[:cut], names, rename_string, namespaces, strip_comments, member_names)
+            del pending[:cut]
+    if pending:
+        yield rewrite_tokens(pending, names, rename_string, namespaces, strip_comments, member_names)
+
+def _count_literals(tokens, strings, identifiers):
+    for kind, value in tokens:
+        if kind == STRING or kind == VERBATIM_STRING:
+            strings[string_body(kind, value)[1]] = None
+        elif kind == IDENT:
+            name = value[1:] if value[0] == '@' else value
+            identifiers[name] = identifiers.get(name, 0) + 1
+
+def scan_tokens(tokens):
+    """
+    Collect imports, namespaces, declared symbols (see csharp_symbols), string
+    literals and identifier counts from a list of significant tokens.
+    """
+    strings = {}
+    identifiers = {}
+    _count_literals(tokens, strings, identifiers)
+    scan = DeclarationIndexer().feed_all(tokens).result()
+    scan['strings'] = list(strings)
+    scan['identifiers'] = identifiers
+    return scan
+
+def scan_chunks(chunks):
+    """
+    scan_tokens for source text arriving in chunks, without holding the file in memory.
+    """
+    indexer = DeclarationIndexer()
+    strings = {}
+    identifiers = {}
+    for tokens in iter_tokens(chunks):
+        tokens = significant_tokens(tokens)
+        _count_literals(tokens, strings, identifiers)
+        indexer.feed_all(tokens)
+    scan = indexer.result()
+    scan['strings'] = list(strings)
+    scan['identifiers'] = identifiers
+    return scan
+
+def merge_scans(scans):
+    """
+    Merge per-file scans into one project-wide scan. A symbol is public or
+    pinned if any of its declarations is.
+    """
+    merged = {'imports': set(), 'namespaces': set(), 'public_namespaces': set(), 'strings': set()}
+    symbols = {}
+    identifiers = {}
+    types = {}
+    accesses = {}
+    for scan in scans:
+        for key in merged:
+            merged[key].update(scan[key])
+        for name, uses in scan['identifiers'].items():
+            identifiers[name] = identifiers.get(name, 0) + uses
+        for name, heads in scan['types'].items():
+            types.setdefault(name, set()).update(heads)
+        for name, receivers in scan['accesses'].items():
+            accesses.setdefault(name, set()).update(map(tuple, receivers))
+        for name, kind, public, pinned in scan['symbols']:
+            flags = symbols.get((name, kind))
+            symbols[(name, kind)] = (public or flags[0], pinned or flags[1]) if flags else (public, pinned)
+    merged = {key: sorted(values) for key, values in merged.items()}
+    merged['symbols'] = [[name, kind, public, pinned] for (name, kind), (public, pinned) in sorted(symbols.items())]
+    merged['identifiers'] = identifiers
+    merged['types'] = {name: sorted(heads) for name, heads in types.items()}
+    merged['accesses'] = {name: sorted(receivers) for name, receivers in accesses.items()}
+    return merged
+
+def scan_source(content):
+    return scan_tokens(significant_tokens(tokenize(content)))
+
+def _scan_file(path):
+    # Sources are read and written with their own line endings, so literals spanning lines match the rewrite
+    with open(path, 'r', encoding='utf-8', newline='') as file:
+        if is_large(path):
+            return scan_chunks(read_chunks(file))
+        return scan_source(file.read())
+
+# Frozen rename tables of a rewrite worker, set once per process
+_rewrite_tables = None
+
+def _init_rewrite_worker(names, member_names, strings, namespaces):
+    global _rewrite_tables
+    _rewrite_tables = (names, member_names, strings, namespaces)
+
+def _rewrite_file(paths):
+    file_path, output_path = paths
+    names, member_names, strings, namespaces = _rewrite_tables
+    if is_large(file_path):
+        with open(file_path, 'r', encoding='utf-8', newline='') as file, \
+                open_output(output_path, newline='') as out:
+            for piece in rewrite_chunks(read_chunks(file), names, strings.get, namespaces,
+                                        member_names=member_names):
+                out.write(piece)
+        return paths
+
+    with open(file_path, 'r', encoding='utf-8', newline='') as file:
+        content = file.read()
+
+    content = rewrite_tokens(tokenize(content), names, strings.get, namespaces, member_names=member_names)
+
+    write_output(output_path, content, newline='')
+    return paths
+
+def _run_jobs(function, items, jobs, desc, initializer=None, initargs=()):
+    """
+    Yield function(item) for every item, using a process pool if jobs > 1.
+    Results are yielded in input order.
+    """
+    if jobs <= 1 or len(items) <= 1:
+        if initializer:
+            initializer(*initargs)
+        yield from tqdm(map(function, items), total=len(items), desc=desc)
+        return
+    chunksize = max(1, len(items) // (jobs * 8))
+    with ProcessPoolExecutor(max_workers=jobs, initializer=initializer, initargs=initargs) as executor:
+        yield from tqdm(executor.map(function, items, chunksize=chunksize), total=len(items), desc=desc)
+
+class Deobfuscator:
+    """
+    Maps obfuscated identifiers, namespaces and strings back to their originals.
+
+    All lookups go through dicts fed by a single tokenizer or regex pass, so the
+    cost per file depends on the file size only, not on the size of the map.
+    Build it once per map load and reuse it for every file.
+    """
+    _WORD_RE = re.compile(r'\b[^\W\d]\w*\b')
+    # Log text is only translated where it has the shape of code: the frame of
+    # a stack trace line, a source file name, or a dotted or nested (+) name
+    _FRAME_RE = re.compile(r'^(?P<lead>\s*at )(?P<frame>.*?)(?P<location> in .*:line \d+)?(?P<end>\s*)$')
+    _LOG_RE = re.compile(r'(?<![\w.])(?P<file>[^\W\d]\w*)\.cs\b'
+                         r'|\b[^\W\d]\w*(?:[.+](?!cs\b)[^\W\d]\w*)+\b')
+
+    def __init__(self, names, strings, files=None):
+        # Lookups go from obfuscated to original names; anything with .get() works
+        self.names = names
+        self.strings = strings
+        self.files = files or {}
+
+    @classmethod
+    def from_maps(cls, obfuscation_map, string_map, namespace_map, file_map=None):
+        return cls({**obfuscation_map, **namespace_map}, string_map, file_map)
+
+    @classmethod
+    def from_store(cls, store):
+        """
+        Query a SymbolMapStore per symbol instead of loading the whole map.
+        """
+        return cls(store.reverse('obfuscation_map', 'namespace_map'), store.reverse('string_map'),
+                   store.reverse('file_map'))
+
+    def deobfuscate_code(self, content):
+        return rewrite_tokens(tokenize(content), self.names, self.strings.get, strip_comments=False)
+
+    def deobfuscate_chunks(self, chunks):
+        return rewrite_chunks(chunks, self.names, self.strings.get, strip_comments=False)
+
+    def _replace_word(self, match):
+        word = match.group()
+        return self.names.get(word, word)
+
+    def _replace_reference(self, match):
+        original = self.files.get(match.group('name'))
+        return match.group() if original is None else f"{original}{match.group('ext')}"
+
+    def deobfuscate_text(self, content):
+        """
+        Deobfuscate a solution or project file. Obfuscation only renames the
+        source file references in them, so only those are mapped back; other
+        words may well equal a short obfuscated name ('cs', 'v4', 'x64').
+        """
+        return _SOURCE_REFERENCE_RE.sub(self._replace_reference, content)
+
+    def _replace_log_match(self, match):
+        name = match.group('file')
+        if name is not None:
+            return f"{self.files.get(name, name)}.cs"
+        return self._WORD_RE.sub(self._replace_word, match.group())
+
+    def deobfuscate_line(self, line):
+        """
+        Deobfuscate one line of a log or stack trace, including file names.
+        Obfuscated names are short words, so plain text is left alone: only
+        stack frames, source file names and qualified names are translated.
+        """
+        frame = self._FRAME_RE.match(line)
+        if frame is None:
+            return self._LOG_RE.sub(self._replace_log_match, line)
+        location = frame.group('location') or ''
+        return ''.join((frame.group('lead'), self._WORD_RE.sub(self._replace_word, frame.group('frame')),
+                        self._LOG_RE.sub(self._replace_log_match, location), frame.group('end')))
+
+def load_deobfuscator(map_path):
+    """
+    Build a Deobfuscator from an obfuscation_map.json, an obfuscation_map.sqlite
+    or an obfuscated output directory containing either of them.
+    """
+    if os.path.isdir(map_path):
+        json_path = os.path.join(map_path, MAP_FILE)
+        map_path = json_path if os.path.exists(json_path) else os.path.join(map_path, STORE_FILE)
+    if map_path.endswith('.sqlite'):
+        return Deobfuscator.from_store(SymbolMapStore(map_path))
+    with open(map_path, 'r', encoding='utf-8') as f:
+        maps = {kind: {v: k for k, v in values.items()} for kind, values in json.load(f).items()}
+    return Deobfuscator.from_maps(maps['obfuscation_map'], maps['string_map'], maps['namespace_map'],
+                                  maps['file_map'])
+
+class _LogRequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        deobfuscate_line = self.server.deobfuscator.deobfuscate_line
+        for line in self.rfile:
+            self.wfile.write(deobfuscate_line(line.decode('utf-8', 'replace')).encode('utf-8'))
+
+def deobfuscate_log(args):
+    """
+    Entry point of the deobfuscate-log command: stream logs from files or stdin,
+    or serve a long-lived local TCP endpoint, with the map loaded only once.
+    """
+    start = time.perf_counter()
+    deobfuscator = load_deobfuscator(args.map)
+    load_time = time.perf_counter() - start
+
+    if args.port is not None:
+        with socketserver.ThreadingTCPServer((args.host, args.port), _LogRequestHandler) as server:
+            server.daemon_threads = True
+            server.deobfuscator = deobfuscator
+            print(f"Map loaded in {load_time:.2f}s, serving on {args.host}:{server.server_address[1]}", file=sys.stderr)
+            try:
+                server.serve_forever()
+            except KeyboardInterrupt:
+                pass
+        return 0
+
+    lines = 0
+    start = time.perf_counter()
+    write = sys.stdout.write
+    try:
+        if args.files:
+            for file_path in args.files:
+                with open(file_path, 'r', encoding='utf-8', errors='replace') as file:
+                    for line in file:
+                        write(deobfuscator.deobfuscate_line(line))
+                        lines += 1
+        else:
+            # Flush per line so `tail -f app.log | ...` stays live
+            for line in sys.stdin:
+                write(deobfuscator.deobfuscate_line(line))
+                sys.stdout.flush()
+                lines += 1
+        sys.stdout.flush()
+    except BrokenPipeError:
+        sys.stderr.close()
+        return 0
+
+    if args.stats:
+        elapsed = time.perf_counter() - start
+        rate = lines / elapsed if elapsed else 0
+        print(f"Map load: {load_time:.3f}s, {lines} lines in {elapsed:.3f}s ({rate:,.0f} lines/sec)", file=sys.stderr)
+    return 0
+
 class CSharpObfuscator:
-    def __init__(self, language=None):
+    def __init__(self, language=None, exclude_public=False, allowlist=(), seed=None, name_key=None):
         self.obfuscation_map = {}
         self.string_map = {}
         self.file_map = {}
         self.namespace_map = {}
         self.external_classes = set()
+        # Declared names that keep their name, and renamed names that may follow a '.'
+        self.kept_names = set()
+        self.member_names = set()
+        self.exclude_public = exclude_public
+        self.allowlist = sorted(set(allowlist))
+        self.allowlist_names = {name for name in self.allowlist if not any(c in name for c in '*?[')}
+        self.allowlist_patterns = [name for name in self.allowlist if name not in self.allowlist_names]
+        self.seed = seed
+        self.name_key = name_key
+        self.reset_allocators()
+        self.deobfuscator = None
+        # Seconds spent per phase of the last obfuscate_project/deobfuscate_project run
+        self.timings = {}
         self.lang = self.load_language(language)
 
     def load_language(self, language=None):
@@ -62,202 +601,576 @@ class CSharpObfuscator:
         with open(lang_file, 'r', encoding='utf-8') as f:
             return json.load(f)
 
+    def reset_allocators(self):
+        """
+        Start name allocation over, keeping every name already in the maps.
+        Identifiers, strings and file names are drawn from one pool so that an
+        obfuscated word always maps back to exactly one original.
+        """
+        used = set()
+        self.name_allocator = NameAllocator(self.seed, self.name_key, used=used)
+        self.string_allocator = NameAllocator(self.seed, self.name_key, reserved=(), used=used)
+        self.file_allocator = NameAllocator(self.seed, self.name_key, FILE_NAME_FIRST, FILE_NAME_CHARS,
+                                            reserved=RESERVED_FILE_NAMES, used=used)
+        for names in (self.obfuscation_map, self.string_map, self.file_map):
+            self.name_allocator.claim(names.values())
+
     def obfuscate_name(self, name):
         if name not in self.obfuscation_map:
-            self.obfuscation_map[name] = ''.join(random.choices(string.ascii_letters, k=10))
+            self.obfuscation_map[name] = self.name_allocator.allocate(name)
         return self.obfuscation_map[name]
 
-    def obfuscate_string(self, string):
-        if string not in self.string_map:
-            self.string_map[string] = ''.join(random.choices(string.ascii_letters, k=len(string)))
-        return self.string_map[string]
+    def obfuscate_string(self, value):
+        if not value:
+            return value
+        if value not in self.string_map:
+            self.string_map[value] = self.string_allocator.allocate(value)
+        return self.string_map[value]
 
     def obfuscate_filename(self, filename):
         name, ext = os.path.splitext(filename)
         if name not in self.file_map:
-            self.file_map[name] = ''.join(random.choices(string.ascii_letters, k=10))
+            self.file_map[name] = self.file_allocator.allocate(name)
         return f"{self.file_map[name]}{ext}"
 
     def remove_comments(self, content):
-        content = re.sub(r'//.*', '', content)
-        content = re.sub(r'/\*[\s\S]*?\*/', '', content)
-        return content
+        return strip_comments(content)
 
     def find_external_classes(self, content):
-        using_statements = re.findall(r'using\s+([^;]+);', content)
-        for statement in using_statements:
-            self.external_classes.add(statement.strip().split('.')[-1])
+        self.external_classes.update(scan_source(content)['imports'])
 
-    def obfuscate_code(self, content):
-        content = self.remove_comments(content)
-        self.find_external_classes(content)
+    def is_allowlisted(self, name):
+        return name in self.allowlist_names or any(fnmatch.fnmatchcase(name, pattern)
+                                                    for pattern in self.allowlist_patterns)
+
+    def register_scan(self, scan):
+        """
+        Decide once per declared name whether it is renamed. Names stay as they
+        are if any declaration is an override, extern or entry point, is public
+        API while exclude_public is set, or matches the allowlist. Names are
+        also kept if the sources use them on a type declared elsewhere, such as
+        Add on a List<T>, a named argument of a framework method or Dispose on
+        an IDisposable.
+        """
+        self.external_classes.update(scan['imports'])
+        # Never hand out a name that already appears in the sources
+        self.name_allocator.reserve(scan['identifiers'])
+        self.file_allocator.reserve(scan['identifiers'])
+        public_namespaces = set(scan['public_namespaces'])
+        kept_namespaces = {namespace for namespace in scan['namespaces'] if self.is_allowlisted(namespace)
+                           or (self.exclude_public and namespace in public_namespaces)}
+        # A kept namespace also keeps every namespace it is nested in
+        kept_prefixes = {kept.rsplit('.', depth)[0] for kept in kept_namespaces for depth in range(kept.count('.') + 1)}
+        renamed_namespaces = []
+        for namespace in scan['namespaces']:
+            if namespace in kept_prefixes:
+                self.namespace_map.pop(namespace, None)
+            else:
+                renamed_namespaces.append(namespace)
 
-        # Obfuscate namespaces
-        for match in re.finditer(r'\bnamespace\s+([a-zA-Z_][\w.]*)', content):
-            old_namespace = match.group(1)
-            new_namespace = self.obfuscate_name(old_namespace)
-            self.namespace_map[old_namespace] = new_namespace
-            content = content.replace(f"namespace {old_namespace}", f"namespace {new_namespace}")
+        declared = {}
+        for name, kind, public, pinned in scan['symbols']:
+            keep, member = declared.get(name, (False, False))
+            declared[name] = (keep or pinned or (public and self.exclude_public), member or kind in MEMBER_KINDS)
+        external_members = externally_accessed(scan)
+        renamed = []
+        for name, (keep, member) in declared.items():
+            if keep or name in self.external_classes or self.is_allowlisted(name) or name in external_members:
+                self.kept_names.add(name)
+                self.obfuscation_map.pop(name, None)
+                continue
+            renamed.append(name)
+            if member:
+                self.member_names.add(name)
 
-        # Obfuscate class names, method names, and variable names
-        for match in re.finditer(r'\b(class|struct|enum|interface|void|int|string|bool|float|double|decimal|char|byte|sbyte|short|ushort|uint|long|ulong)\s+([a-zA-Z_]\w*)', content):
-            old_name = match.group(2)
-            if old_name not in self.external_classes:
-                new_name = self.obfuscate_name(old_name)
-                content = re.sub(r'\b' + old_name + r'\b', new_name, content)
+        # The most used symbols get the shortest names
+        uses = scan['identifiers']
+        for name in sorted(renamed + renamed_namespaces,
+                           key=lambda name: (-uses.get(name.rsplit('.', 1)[-1], 0), name)):
+            self.obfuscate_name(name)
+        for namespace in renamed_namespaces:
+            self.namespace_map[namespace] = self.obfuscation_map[namespace]
 
-        # Obfuscate string contents
-        content = re.sub(r'"([^"\\]*(?:\\.[^"\\]*)*)"', lambda m: f'"{self.obfuscate_string(m.group(1))}"', content)
+    def rename_table(self):
+        return {name: new_name for name, new_name in self.obfuscation_map.items()
+                if name not in self.external_classes and name not in self.kept_names}
 
-        return content
+    def obfuscate_code(self, content):
+        tokens = tokenize(content)
+        self.register_scan(scan_tokens(significant_tokens(tokens)))
+        return rewrite_tokens(tokens, self.rename_table(), self.obfuscate_string, self.namespace_map,
+                              member_names=self.member_names)
 
     def obfuscate_file(self, file_path, output_path):
-        with open(file_path, 'r', encoding='utf-8') as file:
+        if is_large(file_path):
+            # Two passes over the file: the names must be known before anything is written
+            self.register_scan(_scan_file(file_path))
+            with open(file_path, 'r', encoding='utf-8', newline='') as file, \
+                    open_output(output_path, newline='') as out:
+                for piece in rewrite_chunks(read_chunks(file), self.rename_table(), self.obfuscate_string,
+                                            self.namespace_map, member_names=self.member_names):
+                    out.write(piece)
+            print(f"Obfuscated: {file_path} -> {output_path}")
+            return
+
+        with open(file_path, 'r', encoding='utf-8', newline='') as file:
             content = file.read()
 
         obfuscated_content = self.obfuscate_code(content)
 
-        with open(output_path, 'w', encoding='utf-8') as file:
+        with open(output_path, 'w', encoding='utf-8', newline='') as file:
             file.write(obfuscated_content)
 
         print(f"Obfuscated: {file_path} -> {output_path}")
 
-    def update_project_files(self, output_path):
-        for root, dirs, files in os.walk(output_path):
-            for file in files:
-                if file.endswith('.sln'):
-                    self.update_sln_file(os.path.join(root, file))
-                elif file.endswith('.csproj'):
-                    self.update_csproj_file(os.path.join(root, file))
-                elif file == 'AssemblyInfo.cs':
-                    self.update_assembly_info(os.path.join(root, file))
-
-    def update_sln_file(self, sln_path):
-        with open(sln_path, 'r', encoding='utf-8') as file:
-            content = file.read()
+    def rename_file_references(self, content):
+        """
+        Point every source file reference in a project or solution file at
+        its renamed file, in one pass over the text.
+        """
+        file_map = self.file_map
 
-        for old_name, new_name in self.file_map.items():
-            content = content.replace(f"{old_name}.csproj", f"{new_name}.csproj")
+        def replace(match):
+            new_name = file_map.get(match.group('name'))
+            return match.group() if new_name is None else f"{new_name}{match.group('ext')}"
 
-        with open(sln_path, 'w', encoding='utf-8') as file:
-            file.write(content)
+        return _SOURCE_REFERENCE_RE.sub(replace, content)
 
-        print(f"Updated SLN file: {sln_path}")
+    def update_project_file(self, file_path, output_path, content=None):
+        """
+        Rewrite a .sln or .csproj file. Formatting, line endings and a BOM are kept.
+        """
+        if content is None:
+            with open(file_path, 'r', encoding='utf-8', newline='') as file:
+                content = file.read()
 
-    def update_csproj_file(self, csproj_path):
-        tree = ET.parse(csproj_path)
-        root = tree.getroot()
+        write_output(output_path, self.rename_file_references(content), newline='')
+        print(f"Updated {'SLN' if file_path.endswith('.sln') else 'CSPROJ'} file: {output_path}")
 
-        for compile_element in root.findall(".//Compile"):
-            include = compile_element.get('Include')
-            if include:
-                old_name = os.path.splitext(include)[0]
-                if old_name in self.file_map:
-                    new_name = self.file_map[old_name]
-                    compile_element.set('Include', f"{new_name}.cs")
+    def write_maps(self, output_path, map_format='json'):
+        maps = {
+            "obfuscation_map": self.obfuscation_map,
+            "string_map": self.string_map,
+            "file_map": self.file_map,
+            "namespace_map": self.namespace_map
+        }
+        for file, wanted in ((MAP_FILE, map_format in ('json', 'both')), (STORE_FILE, map_format in ('sqlite', 'both'))):
+            if not wanted and os.path.exists(os.path.join(output_path, file)):
+                os.remove(os.path.join(output_path, file))
+        if map_format in ('json', 'both'):
+            with open(os.path.join(output_path, MAP_FILE), 'w', encoding='utf-8') as f:
+                json.dump(maps, f, indent=2, ensure_ascii=False)
+        if map_format in ('sqlite', 'both'):
+            write_store(os.path.join(output_path, STORE_FILE), maps)
 
-        tree.write(csproj_path, encoding='utf-8', xml_declaration=True)
-        print(f"Updated CSPROJ file: {csproj_path}")
+    def cache_settings(self):
+        # Anything that changes the output for unchanged sources belongs here
+        name_key = hashlib.sha256(self.name_key.encode('utf-8')).hexdigest() if self.name_key else None
+        return {'exclude_public': self.exclude_public, 'allowlist': self.allowlist, 'seed': self.seed,
+                'name_key': name_key}
 
-    def update_assembly_info(self, assembly_info_path):
-        with open(assembly_info_path, 'r', encoding='utf-8') as file:
-            content = file.read()
+    def load_cache(self, output_path):
+        """
+        Load the incremental cache and the previous symbol table of an earlier
+        run into this obfuscator. Returns None if there is no usable cache.
+        """
+        cache_path = os.path.join(output_path, CACHE_FILE)
+        try:
+            with open(cache_path, 'r', encoding='utf-8') as f:
+                cache = json.load(f)
+            maps = read_maps(output_path)
+        except (OSError, ValueError, sqlite3.Error):
+            return None
+        if cache.get('version') != CACHE_VERSION or cache.get('settings') != self.cache_settings():
+            return None
 
-        for old_namespace, new_namespace in self.namespace_map.items():
-            content = content.replace(old_namespace, new_namespace)
+        self.obfuscation_map = maps['obfuscation_map']
+        self.string_map = maps['string_map']
+        self.file_map = maps['file_map']
+        self.namespace_map = maps['namespace_map']
+        return cache
 
-        with open(assembly_info_path, 'w', encoding='utf-8') as file:
-            file.write(content)
+    def _sync_assets(self, project_path, output_path, assets, link_mode):
+        # Link every asset that is missing or differs in the output
+        for rel_path in assets:
+            source_path = os.path.join(project_path, rel_path)
+            target_path = os.path.join(output_path, rel_path)
+            try:
+                source_stat = os.stat(source_path)
+                target_stat = os.stat(target_path)
+                if (target_stat.st_size == source_stat.st_size
+                        and target_stat.st_mtime_ns == source_stat.st_mtime_ns):
+                    continue
+            except FileNotFoundError:
+                pass
+            link_or_copy(source_path, target_path, link_mode)
 
-        print(f"Updated AssemblyInfo.cs: {assembly_info_path}")
+    def _remove_stale_files(self, output_path, keep):
+        for root, dirs, files in os.walk(output_path, topdown=False):
+            for file in files:
+                file_path = os.path.join(root, file)
+                if os.path.relpath(file_path, output_path) not in keep:
+                    os.remove(file_path)
+            if root != output_path and not os.listdir(root):
+                os.rmdir(root)
+
+    def _prune_maps(self, merged):
+        namespaces = set(merged['namespaces'])
+        symbols = namespaces | {symbol[0] for symbol in merged['symbols']}
+        strings = set(merged['strings'])
+        # A cached name that now also appears in the sources has to be replaced
+        identifiers = merged['identifiers']
+        self.obfuscation_map = {k: v for k, v in self.obfuscation_map.items() if k in symbols and v not in identifiers}
+        self.namespace_map = {k: v for k, v in self.namespace_map.items() if k in namespaces}
+        self.string_map = {k: v for k, v in self.string_map.items() if k in strings}
+
+    def _lap(self, phase, started):
+        now = time.perf_counter()
+        self.timings[phase] = self.timings.get(phase, 0.0) + now - started
+        return now
 
-    def obfuscate_project(self, project_path):
+    def obfuscate_project(self, project_path, jobs=None, incremental=False, exclude=DEFAULT_EXCLUDES,
+                          link_mode='hardlink', map_format='json'):
+        self.timings = {}
+        clock = time.perf_counter()
         project_path = os.path.abspath(project_path.strip())
         if not os.path.exists(project_path):
             raise FileNotFoundError(f"The directory does not exist: {project_path}")
         
+        jobs = jobs or os.cpu_count() or 1
+
         project_name = os.path.basename(project_path)
         parent_dir = os.path.dirname(project_path)
         output_path = os.path.join(parent_dir, f"{project_name}_Obfuscated")
         
-        if os.path.exists(output_path):
-            shutil.rmtree(output_path)
-        shutil.copytree(project_path, output_path)
-        
-        for root, dirs, files in os.walk(output_path):
-            for file in tqdm(files, desc=self.lang['obfuscating_files']):
-                if file.endswith('.cs'):
-                    file_path = os.path.join(root, file)
-                    new_filename = self.obfuscate_filename(file)
-                    new_file_path = os.path.join(root, new_filename)
-                    os.rename(file_path, new_file_path)
-                    self.obfuscate_file(new_file_path, new_file_path)
-
-        self.update_project_files(output_path)
-
-        # Save obfuscation map
-        with open(os.path.join(output_path, "obfuscation_map.json"), 'w', encoding='utf-8') as f:
+        cache = self.load_cache(output_path) if incremental and os.path.exists(output_path) else None
+        if cache is None:
+            if os.path.exists(output_path):
+                shutil.rmtree(output_path)
+            cached_files = {}
+        else:
+            cached_files = cache['files']
+
+        tree = walk_project(project_path, exclude)
+        for rel_dir in tree['dirs']:
+            os.makedirs(os.path.join(output_path, rel_dir), exist_ok=True)
+        self._sync_assets(project_path, output_path, tree['assets'], link_mode)
+        source_files = tree['sources']
+        clock = self._lap('copy', clock)
+
+        # Reuse the scan of every file whose content has not changed
+        entries = {}
+        to_scan = []
+        for rel_path in source_files:
+            stat = os.stat(os.path.join(project_path, rel_path))
+            entry = cached_files.get(rel_path)
+            if entry is None or entry['size'] != stat.st_size or entry['mtime_ns'] != stat.st_mtime_ns:
+                digest = file_digest(os.path.join(project_path, rel_path))
+                if entry is None or entry['hash'] != digest:
+                    entry = {'hash': digest, 'scan': None}
+                    to_scan.append(rel_path)
+            entries[rel_path] = dict(entry, size=stat.st_size, mtime_ns=stat.st_mtime_ns)
+
+        # Phase 1: collect declarations of all files into one global symbol table
+        scan_paths = [os.path.join(project_path, rel_path) for rel_path in to_scan]
+        for rel_path, scan in zip(to_scan, _run_jobs(_scan_file, scan_paths, jobs, self.lang['scanning_files'])):
+            entries[rel_path]['scan'] = scan
+
+        merged = merge_scans(entry['scan'] for entry in entries.values())
+        self.external_classes = set()
+        self.kept_names = set()
+        self.member_names = set()
+        self._prune_maps(merged)
+        source_names = {os.path.splitext(os.path.basename(rel_path))[0] for rel_path in source_files}
+        self.file_map = {k: v for k, v in self.file_map.items()
+                         if k in source_names and v not in merged['identifiers']}
+        self.reset_allocators()
+        self.register_scan(merged)
+        for value in merged['strings']:
+            self.obfuscate_string(value)
+        clock = self._lap('scan', clock)
+
+        # Phase 2: rewrite changed files and files whose renames changed against the frozen table
+        tables = (self.rename_table(), self.member_names, self.string_map, self.namespace_map)
+        tasks = []
+        for rel_path, entry in entries.items():
+            rel_root, file = os.path.split(rel_path)
+            if file == ASSEMBLY_INFO_FILE:
+                output_rel_path = rel_path
+            else:
+                output_rel_path = os.path.join(rel_root, self.obfuscate_filename(file))
+            fingerprint = rename_fingerprint(entry['scan'], *tables)
+            if (rel_path in to_scan or entry.get('output') != output_rel_path
+                    or entry.get('fingerprint') != fingerprint
+                    or not os.path.exists(os.path.join(output_path, output_rel_path))):
+                tasks.append((os.path.join(project_path, rel_path), os.path.join(output_path, output_rel_path)))
+            entry['output'] = output_rel_path
+            entry['fingerprint'] = fingerprint
+
+        for file_path, new_file_path in _run_jobs(_rewrite_file, tasks, jobs, self.lang['obfuscating_files'],
+                                                  initializer=_init_rewrite_worker, initargs=tables):
+            print(f"Obfuscated: {file_path} -> {new_file_path}")
+        clock = self._lap('rewrite', clock)
+
+        for rel_path in tree['projects']:
+            self.update_project_file(os.path.join(project_path, rel_path), os.path.join(output_path, rel_path))
+        clock = self._lap('project_files', clock)
+
+        if cache is not None:
+            keep = set(tree['assets']) | set(tree['projects']) | {MAP_FILE, STORE_FILE, CACHE_FILE}
+            keep.update(entry['output'] for entry in entries.values())
+            self._remove_stale_files(output_path, keep)
+
+        # Save obfuscation map and the incremental cache next to it
+        self.write_maps(output_path, map_format)
+
+        with open(os.path.join(output_path, CACHE_FILE), 'w', encoding='utf-8') as f:
             json.dump({
-                "obfuscation_map": self.obfuscation_map,
-                "string_map": self.string_map,
-                "file_map": self.file_map,
-                "namespace_map": self.namespace_map
-            }, f, indent=2, ensure_ascii=False)
+                "version": CACHE_VERSION,
+                "settings": self.cache_settings(),
+                "files": entries
+            }, f, ensure_ascii=False)
+        self._lap('maps', clock)
+        return output_path
 
-    def deobfuscate_project(self, obfuscated_path, output_path):
+    def deobfuscate_project(self, obfuscated_path, output_path, exclude=DEFAULT_EXCLUDES, link_mode='hardlink'):
+        self.timings = {}
+        clock = time.perf_counter()
         obfuscated_path = os.path.abspath(obfuscated_path)
         output_path = os.path.abspath(output_path)
-        obfuscation_map_path = os.path.join(obfuscated_path, "obfuscation_map.json")
+        obfuscation_map_path = os.path.join(obfuscated_path, MAP_FILE)
+        store_path = os.path.join(obfuscated_path, STORE_FILE)
 
-        with open(obfuscation_map_path, 'r', encoding='utf-8') as f:
-            obfuscation_data = json.load(f)
-            self.obfuscation_map = {v: k for k, v in obfuscation_data["obfuscation_map"].items()}
-            self.string_map = {v: k for k, v in obfuscation_data["string_map"].items()}
-            self.file_map = {v: k for k, v in obfuscation_data["file_map"].items()}
-            self.namespace_map = {v: k for k, v in obfuscation_data["namespace_map"].items()}
+        if os.path.exists(obfuscation_map_path) or not os.path.exists(store_path):
+            with open(obfuscation_map_path, 'r', encoding='utf-8') as f:
+                obfuscation_data = json.load(f)
+                self.obfuscation_map = {v: k for k, v in obfuscation_data["obfuscation_map"].items()}
+                self.string_map = {v: k for k, v in obfuscation_data["string_map"].items()}
+                self.file_map = {v: k for k, v in obfuscation_data["file_map"].items()}
+                self.namespace_map = {v: k for k, v in obfuscation_data["namespace_map"].items()}
+            self.deobfuscator = Deobfuscator.from_maps(self.obfuscation_map, self.string_map, self.namespace_map,
+                                                       self.file_map)
+        else:
+            # Only the small maps are loaded; identifiers and strings are queried per symbol
+            store = SymbolMapStore(store_path)
+            self.file_map = {v: k for k, v in store.load('file_map').items()}
+            self.namespace_map = {v: k for k, v in store.load('namespace_map').items()}
+            self.obfuscation_map = store.reverse('obfuscation_map')
+            self.string_map = store.reverse('string_map')
+            self.deobfuscator = Deobfuscator.from_store(store)
+        clock = self._lap('maps', clock)
 
         if os.path.exists(output_path):
             shutil.rmtree(output_path)
-        shutil.copytree(obfuscated_path, output_path)
 
-        for root, dirs, files in os.walk(output_path):
-            for file in tqdm(files, desc=self.lang['deobfuscating_files']):
-                file_path = os.path.join(root, file)
-                
-                if file.endswith('.cs') or file in ['AssemblyInfo.cs'] or file.endswith(('.sln', '.csproj')):
-                    self.deobfuscate_file(file_path, file_path)
-                    
-                    if file.endswith('.cs'):
-                        original_filename = self.file_map.get(os.path.splitext(file)[0], file)
-                        new_file_path = os.path.join(root, original_filename)
-                        os.rename(file_path, new_file_path)
+        tree = walk_project(obfuscated_path, exclude)
+        for rel_dir in tree['dirs']:
+            os.makedirs(os.path.join(output_path, rel_dir), exist_ok=True)
+        self._sync_assets(obfuscated_path, output_path, tree['assets'], link_mode)
+        clock = self._lap('copy', clock)
 
-        self.update_project_files(output_path)
+        for rel_path in tqdm(tree['sources'], desc=self.lang['deobfuscating_files']):
+            rel_root, file = os.path.split(rel_path)
+            name, ext = os.path.splitext(file)
+            original_path = os.path.join(output_path, rel_root, f"{self.file_map.get(name, name)}{ext}")
+            self.deobfuscate_file(os.path.join(obfuscated_path, rel_path), original_path)
+        clock = self._lap('rewrite', clock)
+
+        # file_map is reversed here, so this maps the file references back
+        for rel_path in tree['projects']:
+            self.update_project_file(os.path.join(obfuscated_path, rel_path), os.path.join(output_path, rel_path))
+        self._lap('project_files', clock)
 
     def deobfuscate_file(self, file_path, output_path):
-        with open(file_path, 'r', encoding='utf-8') as file:
+        if self.deobfuscator is None:
+            self.deobfuscator = Deobfuscator.from_maps(self.obfuscation_map, self.string_map, self.namespace_map,
+                                                       self.file_map)
+
+        if file_path.endswith('.cs') and is_large(file_path):
+            with open(file_path, 'r', encoding='utf-8', newline='') as file, \
+                    open_output(output_path, newline='') as out:
+                for piece in self.deobfuscator.deobfuscate_chunks(read_chunks(file)):
+                    out.write(piece)
+            print(f"Deobfuscated: {file_path} -> {output_path}")
+            return
+
+        with open(file_path, 'r', encoding='utf-8', newline='') as file:
             content = file.read()
 
-        for obfuscated, original in self.obfuscation_map.items():
-            content = re.sub(r'\b' + obfuscated + r'\b', original, content)
+        if file_path.endswith('.cs'):
+            content = self.deobfuscator.deobfuscate_code(content)
+        else:
+            content = self.deobfuscator.deobfuscate_text(content)
 
-        for obfuscated, original in self.string_map.items():
-            content = content.replace(f'"{obfuscated}"', f'"{original}"')
+        write_output(output_path, content, newline='')
+        print(f"Deobfuscated: {file_path} -> {output_path}")
 
-        for obfuscated, original in self.namespace_map.items():
-            content = content.replace(obfuscated, original)
+def _new_obfuscator(options):
+    allowlist = load_allowlist(options['allowlist']) if options['allowlist'] else ()
+    return CSharpObfuscator(options['lang'], exclude_public=options['exclude_public'], allowlist=allowlist,
+                            seed=options['seed'], name_key=options['name_key'])
 
-        with open(output_path, 'w', encoding='utf-8') as file:
-            file.write(content)
+def _batch_obfuscate(path, options):
+    output_path = f"{path}_Obfuscated"
+    require_writable(output_path if os.path.exists(output_path) else os.path.dirname(path))
+    obfuscator = _new_obfuscator(options)
+    obfuscator.obfuscate_project(path, jobs=options['jobs'], incremental=options['incremental'],
+                                 exclude=options['exclude'], link_mode=options['link'],
+                                 map_format=options['map_format'])
+    return {'output': output_path, 'timings': obfuscator.timings}
 
-        print(f"Deobfuscated: {file_path} -> {output_path}")
+def _batch_deobfuscate(path, options):
+    output_path = deobfuscated_path(path)
+    require_writable(os.path.dirname(output_path))
+    obfuscator = _new_obfuscator(options)
+    obfuscator.deobfuscate_project(path, output_path, exclude=options['exclude'], link_mode=options['link'])
+    return {'output': output_path, 'timings': obfuscator.timings}
+
+def _batch_verify(path, options):
+    # Deobfuscate the existing output of a project into a scratch directory and compare
+    obfuscated_path = f"{path}_Obfuscated"
+    if not os.path.isdir(obfuscated_path):
+        raise FileNotFoundError(f"No obfuscated output to verify: {obfuscated_path}")
+    obfuscator = _new_obfuscator(options)
+    with tempfile.TemporaryDirectory() as temp_dir:
+        restored_path = os.path.join(temp_dir, os.path.basename(path))
+        obfuscator.deobfuscate_project(obfuscated_path, restored_path, exclude=options['exclude'], link_mode='copy')
+        mismatches = compare_trees(path, restored_path, options['exclude'])
+    result = {'output': obfuscated_path, 'timings': obfuscator.timings, 'mismatches': mismatches}
+    if mismatches:
+        result['status'] = 'failed'
+    return result
+
+BATCH_COMMANDS = {
+    'obfuscate': _batch_obfuscate,
+    'deobfuscate': _batch_deobfuscate,
+    'verify': _batch_verify,
+}
+
+def _run_batch_task(task):
+    command, path, options = task
+    result = {'command': command, 'path': path, 'status': 'ok'}
+    start = time.perf_counter()
+    try:
+        if not os.path.isdir(path):
+            raise FileNotFoundError(f"The directory does not exist: {path}")
+        # Per-file progress would interleave between projects; only the JSON result is reported
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull), \
+                contextlib.redirect_stderr(devnull):
+            result.update(BATCH_COMMANDS[command](path, options))
+    except Exception as e:
+        result['status'] = 'error'
+        result['error'] = f"{type(e).__name__}: {e}"
+    result['seconds'] = time.perf_counter() - start
+    return result
+
+def read_manifest(manifest_path):
+    """
+    Read project paths, one per line (# starts a comment), relative to the manifest.
+    """
+    base_dir = os.path.dirname(os.path.abspath(manifest_path))
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        lines = (line.split('#', 1)[0].strip() for line in f)
+        return [os.path.join(base_dir, line) for line in lines if line]
+
+def run_batch(args):
+    """
+    Entry point of the obfuscate/deobfuscate/verify commands: process many
+    projects at once on a bounded process pool and print JSON results.
+    """
+    paths = list(args.paths)
+    if args.manifest:
+        paths.extend(read_manifest(args.manifest))
+    if not paths:
+        print("No project paths given (pass paths or --manifest)", file=sys.stderr)
+        return 2
+    paths = [os.path.abspath(path.strip().strip('"')) for path in paths]
+
+    # Projects run in parallel, so each one is processed in a single process
+    options = {'lang': args.lang, 'jobs': args.jobs or 1, 'incremental': args.incremental, 'exclude': args.exclude,
+               'link': args.link, 'map_format': args.map_format, 'exclude_public': args.exclude_public,
+               'allowlist': args.allowlist, 'seed': args.seed, 'name_key': args.name_key}
+    tasks = [(args.command, path, options) for path in paths]
+    workers = min(args.workers or os.cpu_count() or 1, len(tasks))
+
+    start = time.perf_counter()
+    results = [None] * len(tasks)
+
+    def record(index, result):
+        results[index] = result
+        print(f"{result['status']:>6} {result['seconds']:8.2f}s {result['path']}", file=sys.stderr)
+
+    if workers <= 1:
+        for index, task in enumerate(tasks):
+            record(index, _run_batch_task(task))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(_run_batch_task, task): index for index, task in enumerate(tasks)}
+            for future in as_completed(futures):
+                record(futures[future], future.result())
+
+    report = {
+        'command': args.command,
+        'workers': workers,
+        'seconds': time.perf_counter() - start,
+        'succeeded': sum(result['status'] == 'ok' for result in results),
+        'failed': sum(result['status'] != 'ok' for result in results),
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+    else:
+        json.dump(report, sys.stdout, indent=2, ensure_ascii=False)
+        print()
+    return 1 if report['failed'] else 0
 
 def main():
     parser = argparse.ArgumentParser(description='C# Code Obfuscator/Deobfuscator')
     parser.add_argument('-lang', choices=['en', 'de'], help='Language for the program (en or de)')
+    parser.add_argument('-jobs', type=int, help='Number of worker processes (default: number of CPUs)')
+    parser.add_argument('-exclude', nargs='*', default=list(DEFAULT_EXCLUDES),
+                        help='Glob patterns of directories and files to leave out of the output')
+    parser.add_argument('-link', choices=LINK_MODES, default='hardlink',
+                        help='How unchanged assets are placed in the output (falls back to copy)')
+    parser.add_argument('-map-format', choices=MAP_FORMATS, default='json',
+                        help='Write the symbol map as JSON, as an indexed SQLite file, or both')
+    parser.add_argument('-incremental', action='store_true',
+                        help='Only re-obfuscate files that changed since the last run into the same output')
+    parser.add_argument('-exclude-public', action='store_true',
+                        help='Keep the names of public and protected API (types, members, parameters, namespaces)')
+    parser.add_argument('-allowlist', help='File with names or glob patterns that are never renamed, one per line')
+    parser.add_argument('-seed', help='Seed for the generated names; the same seed gives the same output')
+    parser.add_argument('-name-key', help='Derive each generated name from a keyed hash of the original name')
+
+    subparsers = parser.add_subparsers(dest='command')
+    log_parser = subparsers.add_parser('deobfuscate-log',
+                                       help='Translate obfuscated identifiers in logs and stack traces')
+    log_parser.add_argument('map', help='obfuscation_map.json, obfuscation_map.sqlite or an obfuscated output directory')
+    log_parser.add_argument('files', nargs='*', help='Log files to read (default: stdin)')
+    log_parser.add_argument('--port', type=int, help='Serve line-by-line translation on this TCP port instead')
+    log_parser.add_argument('--host', default='127.0.0.1', help='Address to bind with --port')
+    log_parser.add_argument('--stats', action='store_true', help='Print throughput in lines/sec to stderr')
+    for command, help_text in (('obfuscate', 'Obfuscate projects without prompting'),
+                               ('deobfuscate', 'Deobfuscate *_Obfuscated directories without prompting'),
+                               ('verify', 'Check that the existing *_Obfuscated output of projects deobfuscates '
+                                          'back to their sources')):
+        batch_parser = subparsers.add_parser(command, help=help_text)
+        batch_parser.add_argument('paths', nargs='*', help='Project directories')
+        batch_parser.add_argument('--manifest', help='File with one project directory per line')
+        batch_parser.add_argument('--workers', type=int,
+                                  help='Projects processed at the same time (default: number of CPUs)')
+        batch_parser.add_argument('--output', help='Write the JSON results to this file instead of stdout')
     args = parser.parse_args()
 
-    obfuscator = CSharpObfuscator(args.lang)
+    if args.command == 'deobfuscate-log':
+        return deobfuscate_log(args)
+    if args.command in BATCH_COMMANDS:
+        return run_batch(args)
+
+    allowlist = load_allowlist(args.allowlist) if args.allowlist else ()
+    obfuscator = CSharpObfuscator(args.lang, exclude_public=args.exclude_public, allowlist=allowlist,
+                                  seed=args.seed, name_key=args.name_key)
 
     while True:
         choice = input(obfuscator.lang['menu_prompt'])
@@ -272,7 +1185,9 @@ def main():
                 continue
             try:
                 ensure_permissions(project_path)
-                obfuscator.obfuscate_project(project_path)
+                obfuscator.obfuscate_project(project_path, jobs=args.jobs, incremental=args.incremental,
+                                              exclude=args.exclude, link_mode=args.link,
+                                              map_format=args.map_format)
                 print(obfuscator.lang['obfuscation_complete'].format(f"{project_path}_Obfuscated"))
             except Exception as e:
                 print(f"An error occurred: {str(e)}")
@@ -282,11 +1197,11 @@ def main():
             if not os.path.exists(obfuscated_path):
                 print(f"Error: The directory does not exist: {obfuscated_path}")
                 continue
-            output_path = obfuscated_path.replace("_Obfuscated", "_Deobfuscated")
+            output_path = deobfuscated_path(obfuscated_path)
             try:
                 ensure_permissions(obfuscated_path)
                 ensure_permissions(os.path.dirname(output_path))
-                obfuscator.deobfuscate_project(obfuscated_path, output_path)
+                obfuscator.deobfuscate_project(obfuscated_path, output_path, exclude=args.exclude, link_mode=args.link)
                 print(obfuscator.lang['deobfuscation_complete'].format(output_path))
             except Exception as e:
                 print(f"An error occurred: {str(e)}")
@@ -294,4 +1209,4 @@ def main():
             print(obfuscator.lang['invalid_choice'])
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    sys.exit(main())
\ No newline at end of file
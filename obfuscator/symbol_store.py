@@ -0,0 +1,140 @@
+import os
+import sys
+import json
+import sqlite3
+import argparse
+import threading
+from functools import lru_cache
+
+MAP_KINDS = ('obfuscation_map', 'string_map', 'file_map', 'namespace_map')
+STORE_FILE = "obfuscation_map.sqlite"
+
+_SCHEMA = '''
+CREATE TABLE symbols (
+    kind TEXT NOT NULL,
+    original TEXT NOT NULL,
+    obfuscated TEXT NOT NULL,
+    PRIMARY KEY (kind, original)
+) WITHOUT ROWID;
+'''
+_REVERSE_INDEX = 'CREATE INDEX symbols_reverse ON symbols (obfuscated, kind)'
+
+def write_store(path, maps):
+    """
+    Write the four obfuscation maps (original -> obfuscated) to an SQLite file
+    with a forward (primary key) and a reverse index.
+    """
+    temp_path = f"{path}.tmp"
+    if os.path.exists(temp_path):
+        os.remove(temp_path)
+    connection = sqlite3.connect(temp_path)
+    try:
+        connection.execute('PRAGMA journal_mode=OFF')
+        connection.execute('PRAGMA synchronous=OFF')
+        connection.execute(_SCHEMA)
+        for kind in MAP_KINDS:
+            connection.executemany('INSERT OR REPLACE INTO symbols VALUES (?, ?, ?)',
+                                   ((kind, original, obfuscated) for original, obfuscated in maps.get(kind, {}).items()))
+        connection.execute(_REVERSE_INDEX)
+        connection.commit()
+    finally:
+        connection.close()
+    os.replace(temp_path, path)
+
+class SymbolMapStore:
+    """
+    Read-only, lazily queried view of an obfuscation map stored with
+    write_store. Nothing is loaded up front; every lookup is an indexed query
+    whose result is cached.
+    """
+    def __init__(self, path, cache_size=1 << 16):
+        self.path = path
+        self.connection = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+        self.connection.execute('PRAGMA mmap_size=268435456')
+        self.lock = threading.Lock()
+        self.original = lru_cache(maxsize=cache_size)(self._original)
+        self.obfuscated = lru_cache(maxsize=cache_size)(self._obfuscated)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.connection.close()
+
+    def _query_one(self, sql, params):
+        with self.lock:
+            row = self.connection.execute(sql, params).fetchone()
+        return row[0] if row else None
+
+    def _original(self, kinds, obfuscated):
+        placeholders = ', '.join('?' * len(kinds))
+        return self._query_one(f'SELECT original FROM symbols WHERE obfuscated = ? AND kind IN ({placeholders}) LIMIT 1',
+                               (obfuscated, *kinds))
+
+    def _obfuscated(self, kind, original):
+        return self._query_one('SELECT obfuscated FROM symbols WHERE kind = ? AND original = ?', (kind, original))
+
+    def reverse(self, *kinds):
+        """
+        Dict-like obfuscated -> original lookup over one or more map kinds.
+        """
+        return _ReverseView(self, kinds)
+
+    def load(self, kind=None):
+        """
+        Materialise one map, or all four as a dict of maps (original -> obfuscated).
+        """
+        if kind is None:
+            return {kind: self.load(kind) for kind in MAP_KINDS}
+        with self.lock:
+            rows = self.connection.execute('SELECT original, obfuscated FROM symbols WHERE kind = ?', (kind,)).fetchall()
+        return dict(rows)
+
+    def export_json(self, json_path):
+        with open(json_path, 'w', encoding='utf-8') as f:
+            json.dump(self.load(), f, indent=2, ensure_ascii=False)
+
+class _ReverseView:
+    def __init__(self, store, kinds):
+        self.store = store
+        self.kinds = tuple(kinds)
+
+    def get(self, key, default=None):
+        value = self.store.original(self.kinds, key)
+        return default if value is None else value
+
+    def __getitem__(self, key):
+        value = self.store.original(self.kinds, key)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key):
+        return self.store.original(self.kinds, key) is not None
+
+def main():
+    parser = argparse.ArgumentParser(description='Convert obfuscation maps between JSON and SQLite')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    export_parser = subparsers.add_parser('export', help='Write a JSON map from an SQLite map')
+    export_parser.add_argument('store')
+    export_parser.add_argument('json_file')
+    import_parser = subparsers.add_parser('import', help='Write an SQLite map from a JSON map')
+    import_parser.add_argument('json_file')
+    import_parser.add_argument('store')
+    args = parser.parse_args()
+
+    if args.command == 'export':
+        with SymbolMapStore(args.store) as store:
+            store.export_json(args.json_file)
+        print(f"Exported {args.store} -> {args.json_file}")
+    else:
+        with open(args.json_file, 'r', encoding='utf-8') as f:
+            write_store(args.store, json.load(f))
+        print(f"Imported {args.json_file} -> {args.store}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,105 @@
+import argparse
+import itertools
+import json
+import string
+import sys
+import time
+
+import simple_bf
+from compact import CombinationCodec
+from scoring import SCORING_MODELS, load_model
+
+try:
+    import numpy as np
+    import numpy_scoring
+except ImportError:
+    np = None
+
+CHARACTERS = string.ascii_lowercase + string.digits
+
+def sample_candidates(chars, length, limit):
+    return [''.join(comb) for comb in itertools.islice(itertools.permutations(chars, length), limit)]
+
+def python_scores(candidates):
+    # Per-candidate path: the likelihood filter plus the score used for ordering
+    return [(simple_bf.is_psychologically_likely(comb),
+             simple_bf.ergonomic_score(comb) + simple_bf.pattern_score(comb)) for comb in candidates]
+
+def numpy_scores(candidates, alphabet, matrices, block_size):
+    index = {c: i for i, c in enumerate(alphabet)}
+    results = []
+    for start in range(0, len(candidates), block_size):
+        block = candidates[start:start + block_size]
+        indices = np.array([[index[c] for c in comb] for comb in block], dtype=np.int64)
+        results.append(numpy_scoring.score_block(indices, *matrices))
+    return results
+
+def timed(function, *args):
+    started = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - started
+
+def bench_size(size, length, limit, block_size, rank, model_name, model_source):
+    chars = list(CHARACTERS[:size])
+    simple_bf.characters = chars
+    simple_bf.model = load_model(model_name, chars, model_source)
+    alphabet = list(dict.fromkeys(chars))
+    candidates = sample_candidates(chars, length, limit)
+    result = {'characters': size, 'length': length, 'candidates': len(candidates)}
+
+    expected, seconds = timed(python_scores, candidates)
+    result['python_per_second'] = len(candidates) / seconds
+    vectorized = np is not None and not simple_bf.model.tables(alphabet)[2]
+    if vectorized:
+        matrices = numpy_scoring.model_matrices(simple_bf.model, alphabet)
+        blocks, seconds = timed(numpy_scores, candidates, alphabet, matrices, block_size)
+        result['numpy_per_second'] = len(candidates) / seconds
+        likely = np.concatenate([block[0] for block in blocks])
+        scores = np.concatenate([block[1] for block in blocks])
+        result['same_scores'] = (likely.tolist() == [item[0] for item in expected]
+                                 and scores.tolist() == [item[1] for item in expected])
+    if rank:
+        ranked, seconds = timed(lambda: list(simple_bf.iter_combinations(chars, length - 1, length, simple_bf.model)))
+        result['python_rank_seconds'] = seconds
+        if vectorized:
+            vector_ranked, seconds = timed(numpy_scoring.ranked_combinations, chars, length - 1, length,
+                                           simple_bf.model, block_size)
+            result['numpy_rank_seconds'] = seconds
+            codec = CombinationCodec(chars, length - 1, length)
+            result['same_order'] = [codec.decode(code) for code in vector_ranked.tolist()] == ranked
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description='Candidate scoring throughput of the pure-Python and NumPy paths')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[6, 10, 16, 24, 32], help='Character set sizes')
+    parser.add_argument('--length', type=int, default=5, help='Candidate length')
+    parser.add_argument('--limit', type=int, default=200000, help='Candidates scored per size')
+    parser.add_argument('--block-size', type=int, default=1 << 14, help='Candidates per NumPy block')
+    parser.add_argument('--rank', action='store_true',
+                        help='Also time generating the full ordered list (lengths length-1 to length)')
+    parser.add_argument('--model', choices=sorted(SCORING_MODELS), default='pairs', help='Scoring model')
+    parser.add_argument('--model-source', type=str, default=None, help='Source for --model, see simple_bf.py')
+    parser.add_argument('--json', action='store_true', help='Print the results as JSON')
+    args = parser.parse_args()
+    if np is None:
+        print("NumPy is not installed; only the pure-Python path is timed", file=sys.stderr)
+
+    results = [bench_size(size, args.length, args.limit, args.block_size, args.rank, args.model, args.model_source)
+               for size in args.sizes]
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return 0
+    print(f"{'chars':>5} {'candidates':>10} {'python/s':>12} {'numpy/s':>12} {'speedup':>8} {'same':>5}")
+    for result in results:
+        numpy_rate = result.get('numpy_per_second')
+        speedup = f"{numpy_rate / result['python_per_second']:.1f}x" if numpy_rate else '-'
+        print(f"{result['characters']:>5} {result['candidates']:>10} {result['python_per_second']:>12,.0f} "
+              f"{numpy_rate or 0:>12,.0f} {speedup:>8} {str(result.get('same_scores', '-')):>5}")
+        if 'python_rank_seconds' in result:
+            print(f"      full ordered list: python {result['python_rank_seconds']:.2f}s"
+                  + (f", numpy {result['numpy_rank_seconds']:.2f}s, same order: {result['same_order']}"
+                     if 'numpy_rank_seconds' in result else ''))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,209 @@
+import json
+import mmap
+import os
+import re
+
+HEADER_SIZE = 4096
+# Larger spaces keep the tried combinations in a plain dict
+MAX_BITMAP_BITS = 1 << 34
+
+_NONZERO_RE = re.compile(rb'[^\x00]')
+
+class CombinationCodec:
+    """
+    Numbers every string over the characters with a length from `shortest`
+    to `longest`. Each length is one consecutive block of codes, and within a
+    block a string is read as a number whose digits are its characters'
+    positions in the alphabet (mixed radix over the lengths, base
+    len(alphabet) within one).
+    """
+    def __init__(self, chars, shortest, longest):
+        self.alphabet = list(dict.fromkeys(chars))
+        self.index = {c: i for i, c in enumerate(self.alphabet)}
+        self.shortest = shortest
+        self.longest = longest
+        self.offsets = []
+        size = 0
+        for length in range(shortest, longest + 1):
+            self.offsets.append(size)
+            size += len(self.alphabet) ** length
+        self.size = size
+
+    def settings(self):
+        return {'alphabet': self.alphabet, 'shortest': self.shortest, 'longest': self.longest}
+
+    def encode(self, combination):
+        # None for strings outside the numbered space
+        if not self.shortest <= len(combination) <= self.longest:
+            return None
+        code = 0
+        base = len(self.alphabet)
+        for c in combination:
+            i = self.index.get(c)
+            if i is None:
+                return None
+            code = code * base + i
+        return self.offsets[len(combination) - self.shortest] + code
+
+    def decode(self, code):
+        length = self.shortest
+        while length < self.longest and code >= self.offsets[length - self.shortest + 1]:
+            length += 1
+        code -= self.offsets[length - self.shortest]
+        base = len(self.alphabet)
+        chars = []
+        for _ in range(length):
+            code, digit = divmod(code, base)
+            chars.append(self.alphabet[digit])
+        return ''.join(reversed(chars))
+
+class Bitmap:
+    """
+    A bit array inside a memory-mapped file; only the pages that are touched
+    are read into memory.
+    """
+    def __init__(self, buffer, offset, bits):
+        self.buffer = buffer
+        self.offset = offset
+        self.bits = bits
+        self.length = (bits + 7) // 8
+
+    def __getitem__(self, bit):
+        return self.buffer[self.offset + (bit >> 3)] >> (bit & 7) & 1
+
+    def set(self, bit, value=True):
+        position = self.offset + (bit >> 3)
+        if value:
+            self.buffer[position] |= 1 << (bit & 7)
+        else:
+            self.buffer[position] &= ~(1 << (bit & 7)) & 0xFF
+
+    def _chunks(self, size=1 << 20):
+        for start in range(0, self.length, size):
+            yield start, self.buffer[self.offset + start:self.offset + min(start + size, self.length)]
+
+    def count(self):
+        return sum(bin(int.from_bytes(chunk, 'little')).count('1') for _, chunk in self._chunks())
+
+    def iter_set(self):
+        # Zero bytes are skipped by the regex engine, so sparse bitmaps are cheap to walk
+        for start, chunk in self._chunks():
+            for match in _NONZERO_RE.finditer(chunk):
+                byte = match.group()[0]
+                base = (start + match.start()) << 3
+                for bit in range(8):
+                    if byte >> bit & 1:
+                        yield base + bit
+
+class TriedStore:
+    """
+    Tried combinations and their answers as two on-disk bitmaps over a
+    CombinationCodec (tried, and answered yes), about two bits per possible
+    combination instead of a dict entry per tried one. Combinations the codec
+    cannot number (other characters or lengths) are kept in `extra`.
+
+    Behaves like the dict it replaces. If the file was written for other
+    characters or lengths, its entries are moved into a new file first.
+    """
+    def __init__(self, path, codec):
+        self.path = path
+        self.codec = codec
+        self.extra = {}
+        self.migrated = False
+        header = json.dumps(codec.settings()).encode('utf-8').ljust(HEADER_SIZE - 1) + b'\n'
+        if len(header) > HEADER_SIZE:
+            raise ValueError("Character set too large for the bitmap header")
+        if os.path.exists(path):
+            with open(path, 'rb') as file:
+                existing = file.read(HEADER_SIZE)
+            if existing != header:
+                self._migrate(existing, header)
+        if not os.path.exists(path):
+            self._create(path, header)
+        self.file = open(path, 'r+b')
+        self.map = mmap.mmap(self.file.fileno(), 0)
+        length = (codec.size + 7) // 8
+        self.tried = Bitmap(self.map, HEADER_SIZE, codec.size)
+        self.accepted = Bitmap(self.map, HEADER_SIZE + length, codec.size)
+        self.tried_count = self.tried.count()
+
+    def _create(self, path, header):
+        with open(path, 'wb') as file:
+            file.write(header)
+            # Sparse on most file systems until bits are set
+            file.truncate(HEADER_SIZE + 2 * ((self.codec.size + 7) // 8))
+
+    def _migrate(self, existing, header):
+        try:
+            settings = json.loads(existing)
+            old = TriedStore(self.path, CombinationCodec(settings['alphabet'], settings['shortest'],
+                                                         settings['longest']))
+        except (ValueError, KeyError):
+            # Not a bitmap written by this program; start over rather than guess
+            os.remove(self.path)
+            return
+        temp_path = f"{self.path}.tmp"
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        self._create(temp_path, header)
+        new = TriedStore(temp_path, self.codec)
+        for combination, accepted in old.items():
+            new[combination] = accepted
+        self.extra.update(new.extra)
+        old.close()
+        new.close()
+        os.replace(temp_path, self.path)
+        self.migrated = True
+
+    def __contains__(self, combination):
+        code = self.codec.encode(combination)
+        if code is None:
+            return combination in self.extra
+        return bool(self.tried[code])
+
+    def contains_code(self, code):
+        return bool(self.tried[code])
+
+    def __getitem__(self, combination):
+        code = self.codec.encode(combination)
+        if code is None:
+            return self.extra[combination]
+        if not self.tried[code]:
+            raise KeyError(combination)
+        return bool(self.accepted[code])
+
+    def get(self, combination, default=None):
+        try:
+            return self[combination]
+        except KeyError:
+            return default
+
+    def __setitem__(self, combination, accepted):
+        code = self.codec.encode(combination)
+        if code is None:
+            self.extra[combination] = accepted
+            return
+        if not self.tried[code]:
+            self.tried.set(code)
+            self.tried_count += 1
+        self.accepted.set(code, accepted)
+
+    def __iter__(self):
+        for code in self.tried.iter_set():
+            yield self.codec.decode(code)
+        yield from self.extra
+
+    def __len__(self):
+        return self.tried_count + len(self.extra)
+
+    def items(self):
+        for code in self.tried.iter_set():
+            yield self.codec.decode(code), bool(self.accepted[code])
+        yield from self.extra.items()
+
+    def flush(self):
+        self.map.flush()
+
+    def close(self):
+        self.map.close()
+        self.file.close()
@@ -0,0 +1,96 @@
+import json
+import os
+
+class TriedJournal:
+    """
+    Tried combinations kept as a JSON snapshot plus an append-only log.
+
+    Every answer appends one line to the log, so recording costs the same no
+    matter how long the history is. Loading reads the snapshot and replays the
+    log over it. A line that was only partly written when the process died is
+    cut off. Compaction writes a new snapshot next to the old one, swaps it in
+    with os.replace and empties the log; replaying a log whose entries are
+    already in the snapshot gives the same result, so a crash at any point
+    loses at most the answer being written.
+
+    `entries` may be a compact.TriedStore instead of a dict; its bitmaps are
+    then flushed on compaction and the snapshot keeps only what they cannot hold.
+    """
+    def __init__(self, snapshot_path='tried_combinations.json', fsync=True, compact_every=1000, entries=None):
+        self.snapshot_path = snapshot_path
+        self.log_path = f"{os.path.splitext(snapshot_path)[0]}.log"
+        self.fsync = fsync
+        self.compact_every = compact_every
+        self.entries = {} if entries is None else entries
+        self.pending = 0
+        self.log = None
+
+    def load(self):
+        try:
+            with open(self.snapshot_path, 'r', encoding='utf-8') as file:
+                snapshot = json.load(file)
+        except FileNotFoundError:
+            snapshot = {}
+        for combination, tried in snapshot.items():
+            self.entries[combination] = tried
+        self.pending = 0
+        self.log = open(self.log_path, 'a+b')
+        self.log.seek(0)
+        valid_end = 0
+        for line in self.log:
+            if not line.endswith(b'\n'):
+                break
+            try:
+                combination, tried = json.loads(line)
+            except ValueError:
+                break
+            self.entries[combination] = tried
+            self.pending += 1
+            valid_end += len(line)
+        # Drop a torn last record so the next one starts on a fresh line
+        self.log.truncate(valid_end)
+        moved = False
+        if not isinstance(self.entries, dict):
+            # Snapshot entries that now live in the bitmaps, or entries carried over from other characters
+            moved = self.entries.migrated or any(combination not in self.entries.extra for combination in snapshot)
+        if self.pending >= self.compact_every or moved:
+            self.compact()
+        return self.entries
+
+    def record(self, combination, tried):
+        self.entries[combination] = tried
+        self.log.write(json.dumps([combination, tried], ensure_ascii=False).encode('utf-8') + b'\n')
+        self.log.flush()
+        if self.fsync:
+            os.fsync(self.log.fileno())
+        self.pending += 1
+        if self.pending >= self.compact_every:
+            self.compact()
+
+    def compact(self):
+        snapshot = self.entries
+        if not isinstance(snapshot, dict):
+            # Indexed entries go to disk with the bitmaps, before the log that also holds them is emptied
+            self.entries.flush()
+            snapshot = self.entries.extra
+        temp_path = f"{self.snapshot_path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as file:
+            json.dump(snapshot, file, indent=4)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp_path, self.snapshot_path)
+        self.log.truncate(0)
+        self.log.flush()
+        if self.fsync:
+            os.fsync(self.log.fileno())
+        self.pending = 0
+
+    def close(self):
+        if self.log is None:
+            return
+        if self.pending:
+            self.compact()
+        self.log.close()
+        self.log = None
+        if not isinstance(self.entries, dict):
+            self.entries.close()
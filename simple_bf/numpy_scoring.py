@@ -0,0 +1,81 @@
+import itertools
+
+import numpy as np
+
+from compact import CombinationCodec
+
+BLOCK_SIZE = 1 << 14
+
+def model_matrices(scoring, alphabet):
+    # The adjacent and pattern weight matrices of a model that only weighs pairs
+    adjacent, pair_patterns, longer, _ = scoring.tables(alphabet)
+    if longer:
+        raise ValueError("The NumPy backend only supports models that weigh character pairs")
+    return np.array(adjacent, dtype=np.int64), np.array(pair_patterns, dtype=np.int64)
+
+def score_block(indices, adjacent, pair_patterns):
+    """
+    Score a (candidates, length) array of alphabet indices against the pair
+    weight matrices of a model. Returns which rows are psychologically likely
+    and their ergonomic_score + pattern_score, matching the pure-Python path.
+    """
+    count, length = indices.shape
+    if length < 2:
+        return np.zeros(count, dtype=bool), np.zeros(count, dtype=np.int64)
+    repeats = (indices[:, :, None] == indices[:, None, :]).sum(axis=2)
+    likely = repeats.max(axis=1) <= 2
+    first, second = indices[:, :-1], indices[:, 1:]
+    ergonomic = adjacent[first, second].sum(axis=1)
+    hits = pair_patterns[first, second]
+    # A pattern counts once however often it occurs, so drop pairs seen earlier in the row
+    pair_codes = first * len(adjacent) + second
+    earlier = np.tril(np.ones((length - 1, length - 1), dtype=bool), -1)
+    repeated = ((pair_codes[:, :, None] == pair_codes[:, None, :]) & earlier).any(axis=2)
+    pattern = np.where(repeated, 0, hits).sum(axis=1)
+    likely &= (ergonomic >= 1) & (pattern >= 1)
+    return likely, ergonomic + pattern
+
+def permutation_blocks(chars, length, alphabet_index, block_size=BLOCK_SIZE):
+    # Arrangements as permutations(chars, length) yields them, as alphabet indices
+    lookup = np.array([alphabet_index[c] for c in chars], dtype=np.int64)
+    positions = itertools.permutations(range(len(chars)), length)
+    while True:
+        flat = np.fromiter(itertools.chain.from_iterable(itertools.islice(positions, block_size)), dtype=np.int64)
+        if not flat.size:
+            return
+        yield lookup[flat.reshape(-1, length)]
+
+def ranked_combinations(chars, shortest, longest, scoring, block_size=BLOCK_SIZE):
+    """
+    The order iter_combinations yields, scored block by block with array
+    operations, as an array of CombinationCodec codes: eight bytes per
+    candidate, decoded only when they are used.
+    """
+    codec = CombinationCodec(chars, shortest, longest)
+    alphabet = codec.alphabet
+    alphabet_index = codec.index
+    adjacent, pair_patterns = model_matrices(scoring, alphabet)
+    # Digits are shifted by one so a prefix sorts before its extensions, as in iter_combinations
+    base = len(alphabet) + 1
+    if base ** longest >= 1 << 63 or codec.size >= 1 << 63:
+        raise ValueError(f"{len(alphabet)} characters at length {longest} do not fit a 64-bit code")
+    place = base ** np.arange(longest - 1, -1, -1, dtype=np.int64)
+    order_keys = []
+    codes = []
+    scores = []
+    for length in range(max(shortest, 2), longest + 1):
+        digits = len(alphabet) ** np.arange(length - 1, -1, -1, dtype=np.int64)
+        offset = codec.offsets[length - shortest]
+        for indices in permutation_blocks(chars, length, alphabet_index, block_size):
+            likely, block_scores = score_block(indices, adjacent, pair_patterns)
+            indices = indices[likely]
+            order_keys.append((indices + 1) @ place[:length])
+            codes.append(offset + indices @ digits)
+            scores.append(block_scores[likely])
+    if not codes:
+        return np.zeros(0, dtype=np.int64)
+    # Repeated characters give the same string more than once
+    order_keys, first = np.unique(np.concatenate(order_keys), return_index=True)
+    codes = np.concatenate(codes)[first]
+    scores = np.concatenate(scores)[first]
+    return codes[np.lexsort((order_keys, -scores))]
@@ -0,0 +1,139 @@
+import itertools
+import json
+import math
+from collections import Counter
+
+# name -> factory(chars, source) returning a ScoringModel
+SCORING_MODELS = {}
+
+KEYBOARD_LAYOUTS = {
+    'qwertz': ['1234567890', 'qwertzuiop', 'asdfghjkl', 'yxcvbnm'],
+    'qwerty': ['1234567890', 'qwertyuiop', 'asdfghjkl', 'zxcvbnm'],
+}
+
+def scoring_model(name):
+    def register(factory):
+        SCORING_MODELS[name] = factory
+        return factory
+    return register
+
+def load_model(name, chars, source=None):
+    if name not in SCORING_MODELS:
+        raise ValueError(f"Unknown scoring model '{name}', available: {', '.join(sorted(SCORING_MODELS))}")
+    return SCORING_MODELS[name](chars, source)
+
+class ScoringModel:
+    """
+    Integer weights for scoring a combination.
+
+    The ergonomic score adds `adjacent[pair]` for every adjacent pair of
+    characters, each time it occurs. The pattern score adds `patterns[ngram]`
+    once for every distinct n-gram (two or more characters) the combination
+    contains. A combination is only likely if both are positive. Weights are
+    non-negative integers, so appending a character never lowers a score and
+    the candidate walk can bound what a prefix can still reach.
+    """
+    def __init__(self, adjacent, patterns, every_pair_scores=False):
+        self.adjacent = {pair: weight for pair, weight in adjacent.items() if weight > 0}
+        self.patterns = {ngram: weight for ngram, weight in patterns.items() if weight > 0 and len(ngram) > 1}
+        self.lengths = sorted({len(ngram) for ngram in self.patterns})
+        # Every ordered pair of distinct characters (and of a repeated one) scores, see count_combinations
+        self.every_pair_scores = every_pair_scores
+
+    def ergonomic_score(self, combination):
+        return sum(self.adjacent.get(combination[i:i + 2], 0) for i in range(len(combination) - 1))
+
+    def pattern_score(self, combination):
+        found = {combination[i:i + n] for n in self.lengths for i in range(len(combination) - n + 1)}
+        return sum(self.patterns.get(ngram, 0) for ngram in found)
+
+    def tables(self, alphabet):
+        """
+        Lookup tables over alphabet indices: the adjacent pair weights and the
+        pair pattern weights as matrices, longer patterns keyed by index
+        tuples, and the most a single appended character can add.
+        """
+        index = {c: i for i, c in enumerate(alphabet)}
+        adjacent = [[self.adjacent.get(a + b, 0) for b in alphabet] for a in alphabet]
+        pair_patterns = [[self.patterns.get(a + b, 0) for b in alphabet] for a in alphabet]
+        longer = {tuple(index[c] for c in ngram): weight for ngram, weight in self.patterns.items()
+                  if len(ngram) > 2 and all(c in index for c in ngram)}
+        step = max((max(row) for row in adjacent), default=0) + max((max(row) for row in pair_patterns), default=0)
+        for n in {len(key) for key in longer}:
+            step += max(weight for key, weight in longer.items() if len(key) == n)
+        return adjacent, pair_patterns, longer, step
+
+def _bucket(count):
+    # Corpus counts span orders of magnitude; small integer weights keep the score levels few
+    return int(math.log2(count)) + 1 if count else 0
+
+@scoring_model('pairs')
+def pairs_model(chars, source=None):
+    # Every ordered pair of the characters, counted as often as permutations(chars, 2) yields it
+    pairs = Counter(a + b for a, b in itertools.permutations(chars, 2))
+    return ScoringModel({pair: 1 for pair in pairs}, pairs, every_pair_scores=True)
+
+@scoring_model('keyboard')
+def keyboard_model(chars, source=None):
+    """
+    Neighbouring keys of a keyboard layout (`source`: qwertz or qwerty): 2 for
+    keys next to each other in a row, 1 for keys touching across rows.
+    Patterns are runs of three keys along a row in either direction.
+    """
+    rows = KEYBOARD_LAYOUTS[source or 'qwertz']
+    adjacent = {}
+    patterns = {}
+    for r, row in enumerate(rows):
+        for j in range(len(row) - 1):
+            adjacent[row[j] + row[j + 1]] = adjacent[row[j + 1] + row[j]] = 2
+        for j in range(len(row) - 2):
+            patterns[row[j:j + 3]] = patterns[row[j:j + 3][::-1]] = 3
+        if r + 1 < len(rows):
+            # A key touches the two keys above it in a staggered layout
+            for j, key in enumerate(rows[r + 1]):
+                for above in row[j:j + 2]:
+                    adjacent.setdefault(key + above, 1)
+                    adjacent.setdefault(above + key, 1)
+    # Both cases of a letter sit on the same key
+    wanted = set(chars)
+    adjacent = {a + b: weight for pair, weight in adjacent.items()
+                for a in {pair[0], pair[0].upper()} for b in {pair[1], pair[1].upper()} if a in wanted and b in wanted}
+    patterns = {''.join(ngram): weight for run, weight in patterns.items()
+                for ngram in itertools.product(*({c, c.upper()} for c in run)) if set(ngram) <= wanted}
+    patterns.update({pair: weight for pair, weight in adjacent.items() if weight == 2})
+    return ScoringModel(adjacent, patterns)
+
+@scoring_model('corpus')
+def corpus_model(chars, source):
+    """
+    Bigram and trigram frequencies over the characters, counted in a text
+    file (`source`) such as a word or password list, one entry per line.
+    """
+    if not source:
+        raise ValueError("The corpus model needs a text file")
+    wanted = set(chars)
+    bigrams = Counter()
+    trigrams = Counter()
+    with open(source, 'r', encoding='utf-8', errors='replace') as file:
+        for line in file:
+            line = line.strip()
+            for i in range(len(line) - 1):
+                if line[i] in wanted and line[i + 1] in wanted:
+                    bigrams[line[i:i + 2]] += 1
+                    if i + 2 < len(line) and line[i + 2] in wanted:
+                        trigrams[line[i:i + 3]] += 1
+    adjacent = {pair: _bucket(count) for pair, count in bigrams.items()}
+    patterns = {ngram: _bucket(count) for ngram, count in itertools.chain(bigrams.items(), trigrams.items())}
+    return ScoringModel(adjacent, patterns)
+
+@scoring_model('weights')
+def weights_model(chars, source):
+    """
+    Weights from a JSON file: {"adjacent": {"ab": 2, ...}, "patterns": {"abc": 3, ...}}.
+    """
+    if not source:
+        raise ValueError("The weights model needs a JSON file")
+    with open(source, 'r', encoding='utf-8') as file:
+        weights = json.load(file)
+    return ScoringModel({pair: int(weight) for pair, weight in weights.get('adjacent', {}).items()},
+                        {ngram: int(weight) for ngram, weight in weights.get('patterns', {}).items()})
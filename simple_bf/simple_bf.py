@@ -1,8 +1,19 @@
 import json
 import itertools
+import os
 import signal
 import sys
 import argparse
+import heapq
+from array import array
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from fractions import Fraction
+from math import factorial
+
+from compact import CombinationCodec, TriedStore, MAX_BITMAP_BITS
+from journal import TriedJournal
+from scoring import SCORING_MODELS, load_model
 
 # Load language strings from JSON
 def load_language(lang_file='languages.json'):
@@ -11,21 +22,34 @@ def load_language(lang_file='languages.json'):
 
 # Global variables
 lang = {}
+characters = []
+model = None
+# Numbers the candidate space; see compact.CombinationCodec
+codec = None
+min_length = 4
+max_length = 5
+# numpy_scoring when the NumPy backend is selected, and the codes it ranked
+vector_backend = None
+ranked_combinations = None
+# Counted once on request for models that need a full walk to count
+combination_total = None
+jobs = 1
 tried_combinations = {}
+journal = None
+fsync_journal = True
+compact_every = 1000
+# Combinations a walk over several score levels may hold for sorting, roughly
+BAND_SIZE = 1 << 16
 current_combination = ''
 interruption_count = 0
 
 # Ergonomic score calculation
 def ergonomic_score(combination):
-    easy_pairs = [tuple(pair) for pair in itertools.permutations(characters, 2)]
-    score = sum(1 for i in range(len(combination) - 1) if (combination[i], combination[i + 1]) in easy_pairs)
-    return score
+    return model.ergonomic_score(combination)
 
 # Pattern score calculation
 def pattern_score(combination):
-    common_patterns = [''.join(pattern) for pattern in itertools.permutations(characters, 2)]
-    score = sum(1 for pattern in common_patterns if pattern in combination)
-    return score
+    return model.pattern_score(combination)
 
 def is_psychologically_likely(combination):
     if any(combination.count(c) > 2 for c in combination):
@@ -34,31 +58,256 @@ def is_psychologically_likely(combination):
         return False
     return True
 
-def generate_combinations():
-    valid_combinations = set()
-    for length in range(4, 6):
-        for comb in itertools.permutations(characters, length):
-            comb_str = ''.join(comb)
-            if is_psychologically_likely(comb_str):
-                valid_combinations.add(comb_str)
-    return sorted(valid_combinations, key=lambda x: (ergonomic_score(x) + pattern_score(x)), reverse=True)
+def iter_scored_combinations(chars, shortest, longest, scoring, start=''):
+    """
+    Yield (score, combination) for the psychologically likely arrangements of
+    `chars` that begin with `start` and have a length from `shortest` to
+    `longest`, from the highest score of the ScoringModel `scoring` down,
+    without building the list first.
 
-def load_tried_combinations(filename='tried_combinations.json'):
-    try:
-        with open(filename, 'r') as file:
-            return json.load(file)
-    except FileNotFoundError:
-        return {}
+    Each pass is a depth-first walk over a band of score levels that only
+    enters prefixes which can still land in the band: scores never drop when
+    a character is appended, and the model bounds what one character can
+    add. A band of one level is yielded as it is walked; wider bands, used
+    while levels hold few combinations, are sorted first.
+    """
+    alphabet = list(dict.fromkeys(chars))
+    size = len(alphabet)
+    # Each character can be used as often as it is given, but at most twice
+    remaining = [min(chars.count(c), 2) for c in alphabet]
+    adjacent, pair_patterns, longer, step = scoring.tables(alphabet)
+    lengths = sorted({len(key) for key in longer})
+    # How often each pattern occurs in the current prefix, so repeated patterns count once
+    pair_seen = [[0] * size for _ in range(size)]
+    longer_seen = Counter()
+    path = []
+    prefix = []
+
+    def longer_hits(i):
+        # Patterns of three or more characters that appending character i completes
+        keys = (tuple(path[len(path) - n + 1:]) + (i,) for n in lengths if n - 1 <= len(path))
+        return [key for key in keys if key in longer]
+
+    def walk(ergonomic, pattern):
+        nonlocal next_level
+        depth = len(path)
+        score = ergonomic + pattern
+        if depth >= shortest and ergonomic and pattern:
+            if lowest <= score <= level:
+                yield score, ''.join(prefix)
+            elif score < lowest:
+                next_level = max(next_level, score)
+        if depth == longest:
+            return
+        # Most the characters after the next one can still add
+        room = (longest - depth - 1) * step
+        if depth:
+            last = path[-1]
+            adjacent_row, pattern_row, seen_row = adjacent[last], pair_patterns[last], pair_seen[last]
+        hits = ()
+        for i in range(size):
+            if not remaining[i]:
+                continue
+            if depth:
+                new_ergonomic = ergonomic + adjacent_row[i]
+                new_pattern = pattern if seen_row[i] else pattern + pattern_row[i]
+            else:
+                new_ergonomic, new_pattern = ergonomic, pattern
+            if longer:
+                hits = longer_hits(i)
+                for key in hits:
+                    if not longer_seen[key]:
+                        new_pattern += longer[key]
+            new_score = new_ergonomic + new_pattern
+            if new_score > level:
+                continue
+            if new_score + room < lowest:
+                next_level = max(next_level, new_score + room)
+                continue
+            remaining[i] -= 1
+            path.append(i)
+            prefix.append(alphabet[i])
+            if depth:
+                seen_row[i] += 1
+            for key in hits:
+                longer_seen[key] += 1
+            yield from walk(new_ergonomic, new_pattern)
+            for key in hits:
+                longer_seen[key] -= 1
+            if depth:
+                seen_row[i] -= 1
+            prefix.pop()
+            path.pop()
+            remaining[i] += 1
+
+    start_ergonomic = start_pattern = 0
+    for c in start:
+        i = alphabet.index(c)
+        if not remaining[i]:
+            return
+        if path:
+            last = path[-1]
+            start_ergonomic += adjacent[last][i]
+            if not pair_seen[last][i]:
+                start_pattern += pair_patterns[last][i]
+            pair_seen[last][i] += 1
+        for key in (longer_hits(i) if longer else ()):
+            if not longer_seen[key]:
+                start_pattern += longer[key]
+            longer_seen[key] += 1
+        remaining[i] -= 1
+        path.append(i)
+        prefix.append(c)
+
+    level = (longest - 1) * step
+    levels = 1
+    while level > 0:
+        lowest = max(level - levels + 1, 1)
+        next_level = 0
+        if lowest == level:
+            found = 0
+            for item in walk(start_ergonomic, start_pattern):
+                found += 1
+                yield item
+        else:
+            band = sorted(walk(start_ergonomic, start_pattern), key=lambda item: -item[0])
+            found = len(band)
+            yield from band
+        # Sparse levels are walked several at a time and sorted, dense ones one by one
+        if found < BAND_SIZE:
+            levels *= 2
+        elif found > 4 * BAND_SIZE:
+            levels = max(1, levels // 2)
+        level = next_level
+
+def iter_combinations(chars, shortest, longest, scoring, skip=()):
+    """
+    Combinations from iter_scored_combinations, best first. Combinations in
+    `skip` are looked up as they come, so entries added while iterating are
+    skipped as well.
+    """
+    for _, combination in iter_scored_combinations(chars, shortest, longest, scoring):
+        if combination not in skip:
+            yield combination
+
+def shard_prefixes(chars, longest, shards):
+    # One- or two-character prefixes in walk order, enough to give every worker several shards
+    alphabet = list(dict.fromkeys(chars))
+    if len(alphabet) >= shards or longest < 2:
+        return alphabet
+    return [a + b for a in alphabet for b in alphabet if a != b or chars.count(a) > 1]
+
+def _rank_shard(task):
+    # The shard's combinations as one array of codes per score, best first
+    chars, shortest, longest, scoring, start = task
+    shard_codec = CombinationCodec(chars, shortest, longest)
+    scored = iter_scored_combinations(chars, shortest, longest, scoring, start)
+    blocks = []
+    for score, group in itertools.groupby(scored, key=lambda item: item[0]):
+        codes = (shard_codec.encode(combination) for _, combination in group)
+        blocks.append((score, array('q', codes) if shard_codec.size < 1 << 63 else list(codes)))
+    return blocks
+
+def sharded_codes(chars, shortest, longest, scoring, jobs, progress=None):
+    """
+    The order of iter_combinations as CombinationCodec codes, generated by a
+    process pool. The space is split by prefix, every shard is walked and
+    scored on its own, and the per-shard results are merged by score.
+    heapq.merge keeps the shard order for equal scores, which is the order a
+    single walk would give.
+    """
+    prefixes = shard_prefixes(chars, longest, jobs * 4)
+    tasks = [(chars, shortest, longest, scoring, start) for start in prefixes]
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        futures = [executor.submit(_rank_shard, task) for task in tasks]
+        for done, _ in enumerate(as_completed(futures), 1):
+            if progress:
+                progress(done, len(futures))
+        shards = [future.result() for future in futures]
+    for _, block in heapq.merge(*shards, key=lambda item: -item[0]):
+        yield from block
+
+def count_combinations(chars, shortest, longest):
+    """
+    Number of combinations iter_combinations yields, without walking them:
+    every pair of characters from the set is a scoring pair, so every
+    arrangement of two or more characters counts. The distinct arrangements
+    of length n are n! times the x^n coefficient of the product over the
+    characters of (1 + x + ... + x^k / k!), k being its usable count. Only
+    holds for models where every pair scores, such as the default one.
+    """
+    polynomial = [Fraction(1)]
+    for c in dict.fromkeys(chars):
+        usable = min(chars.count(c), 2)
+        factor = [Fraction(1, factorial(k)) for k in range(usable + 1)]
+        product = [Fraction(0)] * (len(polynomial) + usable)
+        for i, a in enumerate(polynomial):
+            for j, b in enumerate(factor):
+                product[i + j] += a * b
+        polynomial = product
+    return sum(int(polynomial[n] * factorial(n)) for n in range(max(shortest, 2), longest + 1)
+               if n < len(polynomial))
+
+def total_combinations():
+    global combination_total
+    if combination_total is None:
+        if model.every_pair_scores:
+            combination_total = count_combinations(characters, min_length, max_length)
+        else:
+            combination_total = sum(1 for _ in iter_scored_combinations(characters, min_length, max_length, model))
+    return combination_total
+
+def show_shard_progress(done, total):
+    print(lang['shard_progress'].format(done, total), end='\n' if done == total else '\r', flush=True)
 
-def save_tried_combinations(filename='tried_combinations.json'):
-    with open(filename, 'w') as file:
-        json.dump(tried_combinations, file, indent=4)
+# Untried combinations in score order, from the selected backend
+def untried_combinations():
+    global ranked_combinations
+    if vector_backend is None and jobs > 1:
+        return untried_from_codes(sharded_codes(characters, min_length, max_length, model, jobs, show_shard_progress))
+    if vector_backend is None:
+        return iter_combinations(characters, min_length, max_length, model, skip=tried_combinations)
+    if ranked_combinations is None:
+        ranked_combinations = vector_backend.ranked_combinations(characters, min_length, max_length, model)
+    return untried_from_codes(iter_array(ranked_combinations))
+
+def iter_array(codes, size=1 << 16):
+    # Python ints for a slice at a time, not for the whole array
+    for start in range(0, len(codes), size):
+        yield from codes[start:start + size].tolist()
+
+def untried_from_codes(codes):
+    # Ranked codes as strings; with the bitmaps, tried ones are dropped before they are decoded
+    if isinstance(tried_combinations, TriedStore):
+        return (codec.decode(code) for code in codes if not tried_combinations.contains_code(code))
+    return (comb for comb in map(codec.decode, codes) if comb not in tried_combinations)
+
+def is_candidate(combination):
+    if not min_length <= len(combination) <= max_length:
+        return False
+    if any(combination.count(c) > characters.count(c) for c in combination):
+        return False
+    return is_psychologically_likely(combination)
+
+def count_tried_combinations():
+    # Tried strings over the characters in the length range, which is what the bitmap popcount gives. These include
+    # strings entered in the alternative mode that are not candidates, so the count can exceed the total.
+    if isinstance(tried_combinations, TriedStore):
+        return tried_combinations.tried_count
+    return sum(1 for comb in tried_combinations if codec.encode(comb) is not None)
+
+def load_tried_combinations(filename='tried_combinations.json'):
+    global journal
+    store = None
+    if codec.size <= MAX_BITMAP_BITS:
+        store = TriedStore(f"{os.path.splitext(filename)[0]}.bitmap", codec)
+    journal = TriedJournal(filename, fsync=fsync_journal, compact_every=compact_every, entries=store)
+    return journal.load()
 
 def ask_and_save_combination(comb):
     if comb not in tried_combinations:
         response = input(lang['ask_combination'].format(comb)).strip().lower()
-        tried_combinations[comb] = response == lang['yes']
-        save_tried_combinations()
+        journal.record(comb, response == lang['yes'])
     else:
         print(lang['combination_tried'].format(comb))
 
@@ -82,51 +331,93 @@ def main():
     signal.signal(signal.SIGINT, signal_handler)
     
     tried_combinations = load_tried_combinations()
-    all_combinations = generate_combinations()
 
-    tried_count = sum(1 for comb in all_combinations if comb in tried_combinations)
-    print(lang['total_combinations'].format(len(all_combinations)))
-    print(lang['tried_combinations'].format(tried_count))
+    if model.every_pair_scores:
+        print(lang['total_combinations'].format(total_combinations()))
+    else:
+        # Counting means walking the whole space; only done when asked for
+        print(lang['total_combinations_on_request'])
+    print(lang['tried_combinations'].format(count_tried_combinations()))
 
-    while True:
-        choice = input(lang['menu_prompt']).strip()
-        if choice == "1":
-            print(f"\n{lang['tried_combinations_header']}")
-            for comb in tried_combinations:
-                print(comb)
-        elif choice == "2":
-            print(f"\n{lang['untried_combinations_header']}")
-            for comb in all_combinations:
-                if comb not in tried_combinations:
+    try:
+        while True:
+            choice = input(lang['menu_prompt']).strip()
+            if choice == "1":
+                print(f"\n{lang['tried_combinations_header']}")
+                for comb in tried_combinations:
+                    print(comb)
+            elif choice == "2":
+                print(f"\n{lang['untried_combinations_header']}")
+                for comb in untried_combinations():
                     print(comb)
-        elif choice == "3":
-            for comb in all_combinations:
-                if comb not in tried_combinations:
+            elif choice == "3":
+                for comb in untried_combinations():
                     current_combination = comb
                     print(lang['testing_combination'].format(comb))
                     ask_and_save_combination(comb)
-        elif choice == "4":
-            break
-        else:
-            print(lang['invalid_choice'])
+            elif choice == "4":
+                break
+            elif choice == "5":
+                print(lang['total_combinations'].format(total_combinations()))
+            else:
+                print(lang['invalid_choice'])
+    finally:
+        # Also reached through sys.exit() in the signal handler
+        journal.close()
 
 def alternative_mode():
     while True:
         comb = input(lang['enter_combination']).strip()
         if comb.lower() == lang['exit']:
             break
-        if 4 <= len(comb) <= 5 and all(comb.count(c) <= 2 for c in comb):
+        if min_length <= len(comb) <= max_length and all(comb.count(c) <= 2 for c in comb):
+            print(lang['combination_score'].format(ergonomic_score(comb) + pattern_score(comb)))
             ask_and_save_combination(comb)
         else:
-            print(lang['invalid_combination'])
+            print(lang['invalid_combination'].format(min_length, max_length))
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='Combination testing script')
     parser.add_argument('--chars', type=str, default='', help='Characters to use for combinations')
     parser.add_argument('--lang', type=str, default='de', choices=['de', 'en'], help='Language to use (de or en)')
+    parser.add_argument('--min', type=int, default=4, help='Shortest combination length')
+    parser.add_argument('--max', type=int, default=5, help='Longest combination length')
+    parser.add_argument('--backend', choices=['python', 'numpy'], default='python',
+                        help='Score lazily in Python or rank the whole space up front with NumPy')
+    parser.add_argument('--model', choices=sorted(SCORING_MODELS), default='pairs',
+                        help='Scoring model: every pair of the characters, keyboard neighbours, '
+                             'corpus n-gram frequencies or weights from a JSON file')
+    parser.add_argument('--model-source', type=str, default=None,
+                        help='Keyboard layout (qwertz, qwerty), corpus text file or weights JSON file for --model')
+    parser.add_argument('--jobs', type=int, default=1,
+                        help='Worker processes for generating the combinations (python backend)')
+    parser.add_argument('--no-fsync', action='store_true',
+                        help='Do not fsync the journal after every answer (faster, may lose the last answers on a crash)')
+    parser.add_argument('--compact-every', type=int, default=1000,
+                        help='Answers journaled before they are folded into tried_combinations.json')
     args = parser.parse_args()
+    if not 1 <= args.min <= args.max:
+        parser.error('--min must be at least 1 and not greater than --max')
+    if args.backend == 'numpy':
+        try:
+            import numpy_scoring as vector_backend
+        except ImportError:
+            parser.error('the numpy backend needs NumPy installed')
 
     characters = list(args.chars)
+    try:
+        model = load_model(args.model, characters, args.model_source)
+    except (ValueError, KeyError, OSError) as e:
+        parser.error(f"cannot load the {args.model} model: {e}")
+    if vector_backend is not None:
+        try:
+            vector_backend.model_matrices(model, list(dict.fromkeys(characters)))
+        except ValueError as e:
+            parser.error(str(e))
+    min_length, max_length = args.min, args.max
+    codec = CombinationCodec(characters, min_length, max_length)
+    fsync_journal, compact_every = not args.no_fsync, max(1, args.compact_every)
+    jobs = max(1, args.jobs)
     lang = load_language()[args.lang]
 
     main()
\ No newline at end of file